@@ -1,45 +1,73 @@
 # admin.py
 import os
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     CallbackQueryHandler, CommandHandler, MessageHandler,
     ConversationHandler, ContextTypes, filters
 )
-from db import (
-    get_all_requests, get_waiting_requests, get_request_by_id,
+from async_db import (
+    get_request_by_id, get_request_summary, get_user_from_request,
     update_status, update_permission, get_user_requests,
-    add_admin, remove_admin, get_admins,
-    get_task_list, set_task_list
+    claim_request, release_request,
+    add_admin, remove_admin, get_request_stats,
+    set_task_list
 )
-from config import ADMIN_IDS, MAIN_ADMIN_ID
-
-SELECT_ADMIN_ACTION, SELECT_REQ_ACTION, SELECT_REQUEST_ID, SEND_MSG, BROADCAST, CHANGE_STATUS, ADD_ADMIN, REMOVE_ADMIN, SET_TASKS = range(9)
+from db import get_admin_ids, get_task_catalog, is_admin, is_main_admin, STATIC_ADMIN_IDS, UpdateConflict
+from pagination import PAGE_PATTERN, handle_page, send_first_page
+from broadcast import start_broadcast
+from media import send_attachment
+import export
+import flood
+import outbox
+
+SELECT_ADMIN_ACTION, SELECT_REQ_ACTION, SELECT_REQUEST_ID, SEND_MSG, BROADCAST, CHANGE_STATUS, ADD_ADMIN, REMOVE_ADMIN, SET_TASKS, SEARCH_USER, SEARCH_TEXT, EXPORT = range(12)
+
+MAIN_ADMIN_ACTIONS = {"add_admin", "remove_admin", "show_admins", "set_tasks"}
+MAX_TASK_NAME_BYTES = 64  # task names are sent back as callback_data
+
+# --- Keyboards (built once; markups are immutable) ---
+_PANEL_BUTTONS = [
+    [InlineKeyboardButton("📢 Send Announcement", callback_data="broadcast")],
+    [InlineKeyboardButton("📂 View All Requests", callback_data="view_all")],
+    [InlineKeyboardButton("🕒 Active Requests", callback_data="active")],
+    [InlineKeyboardButton("🔍 Search by Request ID", callback_data="search_req")],
+    [InlineKeyboardButton("🔍 Search by User ID", callback_data="search_user")],
+    [InlineKeyboardButton("🔎 Search Text", callback_data="search_text")],
+    [InlineKeyboardButton("📈 Summary Report", callback_data="report")],
+    [InlineKeyboardButton("📤 Export Requests", callback_data="export")],
+    [InlineKeyboardButton("🚦 Flood Control", callback_data="flood")],
+]
+ADMIN_PANEL = InlineKeyboardMarkup(_PANEL_BUTTONS)
+MAIN_ADMIN_PANEL = InlineKeyboardMarkup(_PANEL_BUTTONS + [
+    [InlineKeyboardButton("➕ Add Admin", callback_data="add_admin")],
+    [InlineKeyboardButton("➖ Remove Admin", callback_data="remove_admin")],
+    [InlineKeyboardButton("📋 Show Admins", callback_data="show_admins")],
+    [InlineKeyboardButton("⚙️ Task Types", callback_data="set_tasks")],
+])
+REQUEST_ACTIONS = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👁 View Full", callback_data="view_full")],
+    [InlineKeyboardButton("🔁 Change Status", callback_data="change_status")],
+    [InlineKeyboardButton("💬 Message User", callback_data="send_msg")],
+    [InlineKeyboardButton("🔒 Toggle Permission", callback_data="toggle_msg")],
+    [InlineKeyboardButton("🙋 Claim / Release", callback_data="claim")],
+    [InlineKeyboardButton("🔙 Back", callback_data="back_admin")]
+])
+STATUS_CHOICES = InlineKeyboardMarkup([
+    [InlineKeyboardButton("✅ Accept", callback_data="accepted")],
+    [InlineKeyboardButton("❌ Deny", callback_data="denied")],
+    [InlineKeyboardButton("⏳ Waiting", callback_data="waiting")],
+    [InlineKeyboardButton("✅ Done", callback_data="done")]
+])
 
 # --- Admin Entry ---
 async def admin_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    if user_id not in ADMIN_IDS:
-        await update.message.reply_text("🚫 You are not authorized to use the admin panel.")
+    if not is_admin(user_id):
+        await update.effective_message.reply_text("🚫 You are not authorized to use the admin panel.")
         return ConversationHandler.END
 
-    keyboard = [
-        [InlineKeyboardButton("📢 Send Announcement", callback_data="broadcast")],
-        [InlineKeyboardButton("📂 View All Requests", callback_data="view_all")],
-        [InlineKeyboardButton("🕒 Active Requests", callback_data="active")],
-        [InlineKeyboardButton("🔍 Search by Request ID", callback_data="search_req")],
-        [InlineKeyboardButton("🔍 Search by User ID", callback_data="search_user")],
-        [InlineKeyboardButton("📈 Summary Report", callback_data="report")],
-    ]
-
-    if user_id == MAIN_ADMIN_ID:
-        keyboard += [
-            [InlineKeyboardButton("➕ Add Admin", callback_data="add_admin")],
-            [InlineKeyboardButton("➖ Remove Admin", callback_data="remove_admin")],
-            [InlineKeyboardButton("📋 Show Admins", callback_data="show_admins")],
-            [InlineKeyboardButton("⚙️ Task Types", callback_data="set_tasks")],
-        ]
-
-    await update.message.reply_text("🛠 Admin Panel:", reply_markup=InlineKeyboardMarkup(keyboard))
+    panel = MAIN_ADMIN_PANEL if is_main_admin(user_id) else ADMIN_PANEL
+    await update.effective_message.reply_text("🛠 Admin Panel:", reply_markup=panel)
     return SELECT_ADMIN_ACTION
 
 # --- Admin Menu Actions ---
@@ -48,6 +76,12 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     action = query.data
 
+    # Re-checked on every click so removed admins lose access immediately.
+    user_id = query.from_user.id
+    if not is_admin(user_id) or (action in MAIN_ADMIN_ACTIONS and not is_main_admin(user_id)):
+        await query.message.reply_text("🚫 You are not authorized to do that.")
+        return ConversationHandler.END
+
     if action == "broadcast":
         await query.message.reply_text("📢 Type the announcement to send to all users:")
         return BROADCAST
@@ -64,24 +98,26 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if action == "search_user":
         await query.message.reply_text("🔍 Enter User ID:")
-        return SEND_MSG
+        return SEARCH_USER
+
+    if action == "search_text":
+        await query.message.reply_text("🔎 Enter words to search for (comment, task type or username):")
+        return SEARCH_TEXT
 
     if action == "report":
-        rows = get_all_requests()
-        stats = {"total": 0, "waiting": 0, "accepted": 0, "done": 0, "cancelled": 0, "denied": 0}
-        for r in rows:
-            stats["total"] += 1
-            stats[r[7]] += 1
+        await query.message.reply_text(format_report(await get_request_stats()))
+        return SELECT_ADMIN_ACTION
+
+    if action == "flood":
+        await query.message.reply_text(format_flood_report(*flood.report()))
+        return SELECT_ADMIN_ACTION
+
+    if action == "export":
         await query.message.reply_text(
-            f"📊 Summary:\n"
-            f"Total: {stats['total']}\n"
-            f"✅ Accepted: {stats['accepted']}\n"
-            f"⏳ Waiting: {stats['waiting']}\n"
-            f"✅ Done: {stats['done']}\n"
-            f"❌ Cancelled: {stats['cancelled']}\n"
-            f"🚫 Denied: {stats['denied']}"
+            "📤 Send the format (csv or jsonl) and optional filters, e.g.:\n"
+            "csv status=done,denied type=Software Task from=2024-01-01 to=2024-06-30"
         )
-        return SELECT_ADMIN_ACTION
+        return EXPORT
 
     if action == "add_admin":
         await query.message.reply_text("👤 Send User ID to add as admin:")
@@ -92,34 +128,128 @@ async def handle_admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return REMOVE_ADMIN
 
     if action == "show_admins":
-        admins = get_admins()
-        msg = "👥 Admin List:\n" + "\n".join(str(a) for a in admins)
+        admins = sorted(get_admin_ids())
+        msg = "👥 Admin List:\n" + "\n".join(
+            f"{a} {'⭐' if is_main_admin(a) else '⚙️' if a in STATIC_ADMIN_IDS else ''}" for a in admins
+        )
         await query.message.reply_text(msg)
         return SELECT_ADMIN_ACTION
 
     if action == "set_tasks":
-        current = get_task_list()
+        current = get_task_catalog()[1]
         await query.message.reply_text(
             "⚙️ Current Tasks:\n" + "\n".join(current) +
             "\n\nSend new task types (comma separated):"
         )
         return SET_TASKS
 
+# --- Summary Report ---
+STATUS_LABELS = {
+    "accepted": "✅ Accepted",
+    "waiting": "⏳ Waiting",
+    "done": "✅ Done",
+    "cancelled": "❌ Cancelled",
+    "denied": "🚫 Denied",
+}
+
+def format_report(stats):
+    by_status = stats["status"]
+    msg = f"📊 Summary:\nTotal: {stats['total']}\n"
+    for status, label in STATUS_LABELS.items():
+        msg += f"{label}: {by_status.get(status, 0)}\n"
+    for status, count in by_status.items():
+        if status not in STATUS_LABELS:
+            msg += f"❔ {status or 'unknown'}: {count}\n"
+
+    if stats["task_type"]:
+        msg += "\n🗂 By Type:\n"
+        for task_type, count in sorted(stats["task_type"].items(), key=lambda kv: -kv[1]):
+            msg += f"{task_type or 'unknown'}: {count}\n"
+
+    if stats["day"]:
+        msg += "\n📅 Last Days:\n"
+        for day, count in stats["day"].items():
+            msg += f"{day}: {count}\n"
+    return msg
+
+# --- Flood Control Report ---
+def format_flood_report(dropped, top_users):
+    if not dropped:
+        return "🚦 No updates have been throttled."
+    msg = f"🚦 Throttled updates: {sum(dropped.values())}\n"
+    for action, count in sorted(dropped.items(), key=lambda kv: -kv[1]):
+        msg += f"{action}: {count}\n"
+    if top_users:
+        msg += f"\n👤 Most throttled (last {flood.IDLE_TTL // 60} min):\n"
+        for user_id, count in top_users:
+            msg += f"{user_id}: {count}\n"
+    return msg
+
 # --- Show Requests ---
 async def list_requests(query, context, all_requests=True):
-    rows = get_all_requests() if all_requests else get_waiting_requests()
-    if not rows:
+    listing = {
+        "statuses": None if all_requests else ("waiting",),
+        "title": "📄 Requests" if all_requests else "🕒 Active Requests",
+        "footer": "Send request ID to manage:",
+    }
+    if not await send_first_page(query.message, context, listing):
         await query.message.reply_text("📭 No requests found.")
         return SELECT_ADMIN_ACTION
+    return SELECT_REQUEST_ID
 
-    msg = "📄 Requests:\n\n"
-    for r in rows[:20]:
-        preview = (r[5][:20] + '...') if len(r[5]) > 20 else r[5]
-        msg += f"#{r[0]} | {r[3]} | {r[7]} | {preview} | {'✅' if r[8] else '🚫'}\n"
-    msg += "\nSend request ID to manage:"
-    await query.message.reply_text(msg)
+# --- Search ---
+async def handle_search_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    uid = update.message.text.strip()
+    if not uid.isdigit():
+        await update.message.reply_text("❗ Invalid user ID.")
+        return SEARCH_USER
+    listing = {
+        "user_id": int(uid),
+        "statuses": None,
+        "title": f"👤 Requests of user {uid}",
+        "footer": "Send request ID to manage:",
+    }
+    if not await send_first_page(update.message, context, listing):
+        await update.message.reply_text("📭 No requests found.")
+        return SELECT_ADMIN_ACTION
+    return SELECT_REQUEST_ID
+
+async def handle_search_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    listing = {
+        "search": text,
+        "title": f"🔎 Results for \"{text}\"",
+        "footer": "Send request ID to manage:",
+    }
+    if not await send_first_page(update.message, context, listing):
+        await update.message.reply_text("📭 No matching requests.")
+        return SELECT_ADMIN_ACTION
     return SELECT_REQUEST_ID
 
+# --- Export ---
+async def handle_export(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        fmt, criteria = export.parse_request(update.message.text)
+    except ValueError as e:
+        await update.message.reply_text(f"❗ {e}")
+        return EXPORT
+
+    await update.message.reply_text("⏳ Exporting...")
+    path, count = await export.export_requests(fmt, criteria)
+    try:
+        if not count:
+            await update.message.reply_text("📭 No requests match these filters.")
+        elif os.path.getsize(path) > export.MAX_UPLOAD_BYTES:
+            await update.message.reply_text("⚠️ The export is too large to send; narrow the filters.")
+        else:
+            with open(path, "rb") as f:
+                await update.message.reply_document(
+                    f, filename=export.file_name(fmt), caption=f"📤 {count} requests"
+                )
+    finally:
+        os.remove(path)
+    return SELECT_ADMIN_ACTION
+
 # --- View Request Details ---
 async def handle_request_details(update: Update, context: ContextTypes.DEFAULT_TYPE):
     req_id = update.message.text.strip()
@@ -127,56 +257,50 @@ async def handle_request_details(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text("❗ Invalid request ID.")
         return SELECT_REQUEST_ID
 
-    row = get_request_by_id(int(req_id))
+    row = await get_request_summary(int(req_id))
     if not row:
         await update.message.reply_text("❌ Not found.")
         return SELECT_REQUEST_ID
 
-    context.user_data["selected_request"] = row
+    # Only the id and the version shown are kept; actions re-read what they
+    # need, and status changes fail if someone else changed it since.
+    context.user_data["selected_id"] = row.id
+    context.user_data["selected_version"] = row.version
 
     msg = (
-        f"📄 Request #{row[0]}\n"
-        f"User ID: {row[1]}\n"
-        f"Task: {row[3]}\n"
-        f"Status: {row[7]}\n"
-        f"Comment: {row[5][:20]}...\n"
-        f"Can message admin: {'✅' if row[8] else '🚫'}"
+        f"📄 Request #{row.id}\n"
+        f"User ID: {row.user_id}\n"
+        f"Task: {row.task_type}\n"
+        f"Status: {row.status}\n"
+        f"Comment: {row.preview}\n"
+        f"Can message admin: {'✅' if row.can_message else '🚫'}\n"
+        f"Claimed by: {row.claimed_by or '—'}"
     )
-    keyboard = [
-        [InlineKeyboardButton("👁 View Full", callback_data="view_full")],
-        [InlineKeyboardButton("🔁 Change Status", callback_data="change_status")],
-        [InlineKeyboardButton("💬 Message User", callback_data="send_msg")],
-        [InlineKeyboardButton("🔒 Toggle Permission", callback_data="toggle_msg")],
-        [InlineKeyboardButton("🔙 Back", callback_data="back_admin")]
-    ]
-    await update.message.reply_text(msg, reply_markup=InlineKeyboardMarkup(keyboard))
+    await update.message.reply_text(msg, reply_markup=REQUEST_ACTIONS)
     return SELECT_REQ_ACTION
 
 # --- Request Actions ---
 async def handle_request_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    req = context.user_data.get("selected_request")
-    if not req:
+    req_id = context.user_data.get("selected_id")
+    if not req_id:
         await query.message.reply_text("❗ No request selected.")
         return SELECT_ADMIN_ACTION
 
     if query.data == "view_full":
-        await query.message.reply_text(f"💬 Comment:\n{req[5]}")
-        if req[6]:
-            path = os.path.join("media", req[6])
-            if os.path.exists(path):
-                await query.message.reply_document(InputFile(path))
+        req = await get_request_by_id(req_id)
+        if not req:
+            await query.message.reply_text("❌ Not found.")
+            return SELECT_ADMIN_ACTION
+        await query.message.reply_text(f"💬 Comment:\n{req.comment}")
+        if req.media or req.media_file_id:
+            if not await send_attachment(query.message, req.media_file_id, req.media_kind, req.media):
+                await query.message.reply_text("⚠️ The attachment is no longer available.")
         return SELECT_REQ_ACTION
 
     if query.data == "change_status":
-        buttons = [
-            [InlineKeyboardButton("✅ Accept", callback_data="accepted")],
-            [InlineKeyboardButton("❌ Deny", callback_data="denied")],
-            [InlineKeyboardButton("⏳ Waiting", callback_data="waiting")],
-            [InlineKeyboardButton("✅ Done", callback_data="done")]
-        ]
-        await query.message.reply_text("Select new status:", reply_markup=InlineKeyboardMarkup(buttons))
+        await query.message.reply_text("Select new status:", reply_markup=STATUS_CHOICES)
         return CHANGE_STATUS
 
     if query.data == "send_msg":
@@ -184,58 +308,115 @@ async def handle_request_action(update: Update, context: ContextTypes.DEFAULT_TY
         return SEND_MSG
 
     if query.data == "toggle_msg":
-        update_permission(req[0], 0 if req[8] else 1)
+        req = await get_request_summary(req_id)
+        if not req:
+            await query.message.reply_text("❌ Not found.")
+            return SELECT_ADMIN_ACTION
+        can_message = 0 if req.can_message else 1
+        try:
+            await update_permission(
+                req_id, can_message, outbox.permission_notice(req_id, can_message),
+                expected_version=req.version, admin_id=query.from_user.id
+            )
+        except UpdateConflict as e:
+            await query.message.reply_text(format_conflict(e))
+            return SELECT_ADMIN_ACTION
+        outbox.wake()
         await query.message.reply_text("🔒 Message permission toggled.")
         return SELECT_ADMIN_ACTION
 
+    if query.data == "claim":
+        req = await get_request_summary(req_id)
+        if not req:
+            await query.message.reply_text("❌ Not found.")
+            return SELECT_ADMIN_ACTION
+        admin_id = query.from_user.id
+        try:
+            if req.claimed_by == admin_id:
+                await release_request(req_id, admin_id)
+                await query.message.reply_text(f"🙋 Request #{req_id} released.")
+            else:
+                await claim_request(req_id, admin_id)
+                await query.message.reply_text(f"🙋 Request #{req_id} is now yours.")
+        except UpdateConflict as e:
+            await query.message.reply_text(format_conflict(e))
+        return SELECT_REQ_ACTION
+
     if query.data == "back_admin":
         return await admin_start(update, context)
 
 # --- Change Status ---
+def format_conflict(conflict):
+    if conflict.reason == "missing":
+        return "❌ Not found (it may have been archived)."
+    if conflict.reason == "claimed":
+        return f"⛔ Request is claimed by admin {conflict.claimed_by}."
+    if conflict.reason == "transition":
+        return f"⛔ A {conflict.status} request can't be moved to that status."
+    return f"⚠️ Request was changed by someone else (now {conflict.status}). Open it again and retry."
+
+
 async def set_new_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    req = context.user_data.get("selected_request")
-    update_status(req[0], query.data)
+    req_id = context.user_data.get("selected_id")
+    try:
+        changed = await update_status(
+            req_id, query.data, outbox.status_notice(req_id, query.data),
+            expected_version=context.user_data.get("selected_version"), admin_id=query.from_user.id
+        )
+    except UpdateConflict as e:
+        await query.message.reply_text(format_conflict(e))
+        return SELECT_ADMIN_ACTION
+    if not changed:
+        await query.message.reply_text(f"ℹ️ Request is already {query.data}; nothing changed.")
+        return SELECT_ADMIN_ACTION
+    outbox.wake()
     await query.message.reply_text(f"✅ Status updated to {query.data}")
     return SELECT_ADMIN_ACTION
 
 # --- Message User ---
 async def handle_message_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    req = context.user_data.get("selected_request")
-    await update.get_bot().send_message(req[1], f"📩 Admin Message:\n{update.message.text}")
+    user_id = await get_user_from_request(context.user_data.get("selected_id"))
+    if user_id is None:
+        await update.message.reply_text("❌ Not found.")
+        return SELECT_ADMIN_ACTION
+    await update.get_bot().send_message(user_id, f"📩 Admin Message:\n{update.message.text}")
     await update.message.reply_text("✅ Message sent to user.")
     return SELECT_ADMIN_ACTION
 
 # --- Broadcast Message ---
 async def handle_broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    users = set([r[1] for r in get_all_requests()])
-    for uid in users:
-        try:
-            await update.get_bot().send_message(uid, f"📢 Announcement:\n\n{update.message.text}")
-        except:
-            continue
-    await update.message.reply_text("✅ Sent to all users.")
+    # Delivery runs in the background; progress is reported in its own message.
+    await start_broadcast(
+        context.application, update.effective_user.id, update.effective_chat.id, update.message.text
+    )
     return SELECT_ADMIN_ACTION
 
 # --- Admin Management (main only) ---
 async def add_new_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.message.text.strip()
     if uid.isdigit():
-        add_admin(int(uid))
+        await add_admin(int(uid))
         await update.message.reply_text("✅ Admin added.")
     return SELECT_ADMIN_ACTION
 
 async def remove_existing_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.message.text.strip()
-    if uid.isdigit():
-        remove_admin(int(uid))
+    if uid.isdigit() and int(uid) in STATIC_ADMIN_IDS:
+        await update.message.reply_text("⚙️ This admin is set in config.py and can't be removed here.")
+    elif uid.isdigit():
+        await remove_admin(int(uid))
         await update.message.reply_text("✅ Admin removed.")
     return SELECT_ADMIN_ACTION
 
 async def handle_set_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    tasks = [t.strip() for t in update.message.text.split(",") if t.strip()]
-    set_task_list(tasks)
+    tasks = list(dict.fromkeys(t.strip() for t in update.message.text.split(",") if t.strip()))
+    too_long = [t for t in tasks if len(t.encode()) > MAX_TASK_NAME_BYTES]
+    if too_long:
+        await update.message.reply_text(f"❗ Task names must be at most {MAX_TASK_NAME_BYTES} bytes: {', '.join(too_long)}")
+        return SET_TASKS
+    await set_task_list(tasks)
     await update.message.reply_text("✅ Task types updated.")
     return SELECT_ADMIN_ACTION
 
@@ -246,16 +427,24 @@ def get_admin_handler():
         states={
             SELECT_ADMIN_ACTION: [CallbackQueryHandler(handle_admin_menu)],
             BROADCAST: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_broadcast)],
-            SELECT_REQUEST_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_request_details)],
+            SELECT_REQUEST_ID: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_request_details),
+                CallbackQueryHandler(handle_page, pattern=PAGE_PATTERN),
+            ],
             SELECT_REQ_ACTION: [CallbackQueryHandler(handle_request_action)],
             CHANGE_STATUS: [CallbackQueryHandler(set_new_status)],
             SEND_MSG: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message_user)],
             ADD_ADMIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_new_admin)],
             REMOVE_ADMIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, remove_existing_admin)],
             SET_TASKS: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_set_tasks)],
+            SEARCH_USER: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search_user)],
+            SEARCH_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search_text)],
+            EXPORT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_export)],
         },
         fallbacks=[],
-        allow_reentry=True
+        allow_reentry=True,
+        name="admin",
+        persistent=True
     )
 from telegram.ext import ConversationHandler, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 
@@ -265,14 +454,22 @@ def get_main_admin_handler():
         states={
             SELECT_ADMIN_ACTION: [CallbackQueryHandler(handle_admin_menu)],
             BROADCAST: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_broadcast)],
-            SELECT_REQUEST_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_request_details)],
+            SELECT_REQUEST_ID: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_request_details),
+                CallbackQueryHandler(handle_page, pattern=PAGE_PATTERN),
+            ],
             SELECT_REQ_ACTION: [CallbackQueryHandler(handle_request_action)],
             CHANGE_STATUS: [CallbackQueryHandler(set_new_status)],
             SEND_MSG: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message_user)],
             ADD_ADMIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_new_admin)],
             REMOVE_ADMIN: [MessageHandler(filters.TEXT & ~filters.COMMAND, remove_existing_admin)],
             SET_TASKS: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_set_tasks)],
+            SEARCH_USER: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search_user)],
+            SEARCH_TEXT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_search_text)],
+            EXPORT: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_export)],
         },
         fallbacks=[],
-        allow_reentry=True
+        allow_reentry=True,
+        name="main_admin",
+        persistent=True
     )
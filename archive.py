@@ -0,0 +1,68 @@
+# archive.py
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from async_db import archive_requests, incremental_vacuum
+from background import BackgroundTasks
+import media
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_INTERVAL = 3600   # seconds between archive passes
+BATCH_SIZE = 500          # requests moved per transaction
+VACUUM_PAGES = 1000       # pages freed per step
+PAUSE = 0.05              # seconds between steps, so handlers get the writer
+
+
+# --- Retention ---
+# Requests closed (done / denied / cancelled) more than `days` ago move to
+# the archive database in small batches, each a short transaction of its
+# own, so handlers never queue behind one long write. Media that only
+# archived requests used then moves to cold storage, and the pages the live
+# tables no longer need are returned to the filesystem a step at a time.
+async def run_once(days):
+    cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+    archived, released = 0, []
+    while True:
+        count, names = await archive_requests(cutoff, BATCH_SIZE)
+        archived += count
+        released += names
+        if count < BATCH_SIZE:
+            break
+        await asyncio.sleep(PAUSE)
+
+    loop = asyncio.get_running_loop()
+    moved = await loop.run_in_executor(None, media.move_to_cold, released) if released else 0
+
+    free = None
+    while True:
+        left = await incremental_vacuum(VACUUM_PAGES)
+        if not left or left == free:  # done, or no progress (not in incremental mode)
+            break
+        free = left
+        await asyncio.sleep(PAUSE)
+    if archived:
+        logger.info("archived %d requests, moved %d media files to cold storage", archived, moved)
+    return archived
+
+
+async def _run(days):
+    while True:
+        try:
+            await run_once(days)
+        except Exception:
+            logger.exception("archive pass failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+_tasks = BackgroundTasks()
+
+
+def start(days):
+    if days:
+        _tasks.spawn(_run(days))
+
+
+async def stop():
+    await _tasks.stop()
@@ -0,0 +1,199 @@
+# async_db.py
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import metrics
+
+# sqlite3 calls block, so handlers run them on dedicated DB threads
+# instead of stalling the bot's event loop. One thread per pooled
+# connection (writer + readers). The sync API in db.py stays usable
+# from scripts. Every call is timed into metrics.
+_executor = ThreadPoolExecutor(max_workers=db.READER_COUNT + 1, thread_name_prefix="db")
+
+
+def _in_db_thread(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        return await loop.run_in_executor(_executor, metrics.timed_db_call, call, time.perf_counter())
+    return wrapper
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
+
+
+# --- Group Commit ---
+# Hot-path writes (submissions, status changes, ...) don't each take the
+# writer and commit on their own: while one write or batch is in flight,
+# new ones queue here, and one writer task then runs whatever piled up (at
+# most GROUP_COMMIT_MAX calls) in a single transaction via db.write_batch.
+# A write arriving while nothing is in flight runs straight away. Each
+# caller awaits its own future and gets its own result or exception, only
+# once the batch has committed. Every call is still timed into metrics
+# under its own name, batched or not.
+GROUP_COMMIT_WINDOW = 0  # > 0: also wait this many seconds for a batch to fill
+GROUP_COMMIT_MAX = 64
+
+
+class _GroupCommit:
+    def __init__(self):
+        self._pending = []   # (call, future, submitted)
+        self._full = None    # future the writer waits on while gathering
+        self._busy = False   # a write or batch is in flight
+        self._task = None    # the writer task, while batches are pending
+
+    async def submit(self, call):
+        loop = asyncio.get_running_loop()
+        if not self._busy:
+            self._busy = True
+            metrics.GROUP_COMMIT_SIZE.observe(1)
+            try:
+                return await loop.run_in_executor(_executor, metrics.timed_db_call, call, time.perf_counter())
+            finally:
+                if self._pending:
+                    self._task = loop.create_task(self._run())  # stays busy
+                else:
+                    self._busy = False
+
+        future = loop.create_future()
+        self._pending.append((call, future, time.perf_counter()))
+        if len(self._pending) >= GROUP_COMMIT_MAX and self._full and not self._full.done():
+            self._full.set_result(None)
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Also after each batch: callers it woke get to queue their
+                # next write before the writer lets go.
+                if 0 < len(self._pending) < GROUP_COMMIT_MAX and GROUP_COMMIT_WINDOW:
+                    self._full = loop.create_future()
+                    try:
+                        await asyncio.wait_for(self._full, GROUP_COMMIT_WINDOW)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._full = None
+                else:
+                    await asyncio.sleep(0)  # let writes queued in this loop iteration join
+                if not self._pending:
+                    break
+                batch, self._pending = self._pending[:GROUP_COMMIT_MAX], self._pending[GROUP_COMMIT_MAX:]
+                metrics.GROUP_COMMIT_SIZE.observe(len(batch))
+                timed = [functools.partial(metrics.timed_db_call, call, submitted) for call, _, submitted in batch]
+                # A lone write runs as a plain call: no savepoint overhead.
+                single = len(batch) == 1
+                try:
+                    if single:
+                        results = [(await loop.run_in_executor(_executor, timed[0]), None)]
+                    else:
+                        results = await loop.run_in_executor(_executor, db.write_batch, timed)
+                except Exception as e:  # the call or the commit failed: nothing was written
+                    results = [(None, e)] * len(batch)
+                for (_, future, _), (result, error) in zip(batch, results):
+                    if future.done():  # caller was cancelled
+                        continue
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+        finally:
+            self._busy = False
+
+    # Waits until every queued write has committed and its caller has its
+    # result (post_stop); writes submitted meanwhile are waited for too.
+    async def flush(self):
+        while self._busy or self._pending:
+            if self._task is not None and not self._task.done():
+                await asyncio.shield(self._task)
+            else:
+                await asyncio.sleep(0.01)  # a lone write in flight, or the writer starting
+
+
+_group_commit = _GroupCommit()
+
+
+async def flush_writes():
+    await _group_commit.flush()
+
+
+def _in_write_queue(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await _group_commit.submit(functools.partial(fn, *args, **kwargs))
+    return wrapper
+
+
+# --- Setup ---
+init_db = _in_db_thread(db.init_db)
+get_schema_version = _in_db_thread(db.get_schema_version)
+
+# --- Request Management ---
+add_request = _in_write_queue(db.add_request)
+update_status = _in_write_queue(db.update_status)
+update_permission = _in_write_queue(db.update_permission)
+update_comment = _in_write_queue(db.update_comment)
+claim_request = _in_write_queue(db.claim_request)
+release_request = _in_write_queue(db.release_request)
+get_request_by_id = _in_db_thread(db.get_request_by_id)
+get_request_summary = _in_db_thread(db.get_request_summary)
+get_request_status = _in_db_thread(db.get_request_status)
+get_all_requests = _in_db_thread(db.get_all_requests)
+get_waiting_requests = _in_db_thread(db.get_waiting_requests)
+get_user_requests = _in_db_thread(db.get_user_requests)
+get_requests_page = _in_db_thread(db.get_requests_page)
+search_requests = _in_db_thread(db.search_requests)
+get_user_from_request = _in_db_thread(db.get_user_from_request)
+set_request_media = _in_write_queue(db.set_request_media)
+
+# --- Reports ---
+get_request_stats = _in_db_thread(db.get_request_stats)
+rebuild_request_stats = _in_db_thread(db.rebuild_request_stats)
+
+# --- Subscribers ---
+upsert_subscriber = _in_write_queue(db.upsert_subscriber)
+mark_subscriber_blocked = _in_db_thread(db.mark_subscriber_blocked)
+get_subscriber_count = _in_db_thread(db.get_subscriber_count)
+get_subscriber_batch = _in_db_thread(db.get_subscriber_batch)
+
+# --- Broadcasts ---
+create_broadcast = _in_db_thread(db.create_broadcast)
+set_broadcast_message = _in_db_thread(db.set_broadcast_message)
+checkpoint_broadcast = _in_db_thread(db.checkpoint_broadcast)
+finish_broadcast = _in_db_thread(db.finish_broadcast)
+get_running_broadcasts = _in_db_thread(db.get_running_broadcasts)
+
+# --- Outbox ---
+get_due_outbox = _in_db_thread(db.get_due_outbox)
+delete_outbox = _in_db_thread(db.delete_outbox)
+retry_outbox = _in_db_thread(db.retry_outbox)
+
+# --- Archive ---
+archive_requests = _in_db_thread(db.archive_requests)
+incremental_vacuum = _in_db_thread(db.incremental_vacuum)
+
+# --- Bot Persistence ---
+load_persistence_data = _in_db_thread(db.load_persistence_data)
+load_conversations = _in_db_thread(db.load_conversations)
+save_persistence = _in_db_thread(db.save_persistence)
+
+# --- Admin Management ---
+add_admin = _in_db_thread(db.add_admin)
+remove_admin = _in_db_thread(db.remove_admin)
+get_admins = _in_db_thread(db.get_admins)
+reload_admin_ids = _in_db_thread(db.reload_admin_ids)
+# is_admin / get_admin_ids are in-memory lookups: call them from db directly.
+
+# --- Task List Management ---
+get_task_list = _in_db_thread(db.get_task_list)
+add_task = _in_db_thread(db.add_task)
+remove_task = _in_db_thread(db.remove_task)
+set_task_list = _in_db_thread(db.set_task_list)
+reload_task_catalog = _in_db_thread(db.reload_task_catalog)
+# get_task_catalog is an in-memory lookup: call it from db directly.
@@ -0,0 +1,31 @@
+# background.py
+# Long-running jobs (outbox, archive, broadcasts, media downloads) run as
+# plain asyncio tasks, not Application.create_task: the application waits
+# for those on stop, which would hold a deploy until e.g. a whole broadcast
+# is delivered. BackgroundTasks keeps its tasks referenced (asyncio itself only
+# holds weak references) and cancels them from post_stop; every job is
+# written to pick up where it left off after a restart.
+
+import asyncio
+
+
+class BackgroundTasks:
+    def __init__(self):
+        self._tasks = set()
+
+    def spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # Gives running tasks `grace` seconds to finish, then cancels the rest.
+    async def stop(self, grace=0):
+        if not self._tasks:
+            return
+        pending = set(self._tasks)
+        if grace:
+            _, pending = await asyncio.wait(pending, timeout=grace)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
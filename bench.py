@@ -0,0 +1,659 @@
+# bench.py
+# Ad-hoc benchmarks. Usage: python bench.py <name> [n]
+
+import asyncio
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime
+
+import db
+
+
+def _rate(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return n / (time.perf_counter() - start)
+
+
+def _report(title, results):
+    print(title)
+    for name, ops in results:
+        print(f"  {name:<28} {ops:>12,.0f} ops/sec")
+
+
+# --- Connections: pooled WAL connections vs connect-per-call ---
+def _legacy_add_request(path, i):
+    with sqlite3.connect(path) as conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO requests (user_id, username, task_type, sub_type, comment, media, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (i, "bench", "Other", None, "comment", None, datetime.now().isoformat()))
+        conn.commit()
+        return c.lastrowid
+
+
+def _legacy_get_request(path, i):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT * FROM requests WHERE id = ?", (i + 1,)).fetchone()
+
+
+def _legacy_update_status(path, i):
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE requests SET status = ? WHERE id = ?", ("accepted", i + 1))
+
+
+def _mixed(read, write, n, readers=4):
+    # `readers` threads hammer lookups while the main thread writes.
+    stop = threading.Event()
+    reads = [0] * readers
+
+    def reader(slot):
+        i = 0
+        while not stop.is_set():
+            read(i % n)
+            i += 1
+        reads[slot] = i
+
+    threads = [threading.Thread(target=reader, args=(k,)) for k in range(readers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for i in range(n):
+        write(i)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return n / elapsed, sum(reads) / elapsed
+
+
+def bench_connections(n=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, "legacy.db")
+        db.configure(legacy)
+        db.init_db()
+        db.close_pool()
+        with sqlite3.connect(legacy) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        _report(f"connect-per-call (n={n})", [
+            ("add_request", _rate(lambda i: _legacy_add_request(legacy, i), n)),
+            ("get_request_by_id", _rate(lambda i: _legacy_get_request(legacy, i), n)),
+            ("update_status", _rate(lambda i: _legacy_update_status(legacy, i), n)),
+        ])
+        writes, reads = _mixed(lambda i: _legacy_get_request(legacy, i),
+                               lambda i: _legacy_update_status(legacy, i), n)
+        _report("  mixed (1 writer, 4 readers)", [("writes", writes), ("reads", reads)])
+
+        db.configure(os.path.join(tmp, "pooled.db"))
+        db.init_db()
+        _report(f"pooled WAL connections (n={n})", [
+            ("add_request", _rate(lambda i: db.add_request(i, "bench", "Other", None, "comment"), n)),
+            ("get_request_by_id", _rate(lambda i: db.get_request_by_id(i + 1), n)),
+            ("update_status", _rate(lambda i: db.update_status(i + 1, "accepted"), n)),
+        ])
+        writes, reads = _mixed(lambda i: db.get_request_by_id(i + 1),
+                               lambda i: db.update_status(i + 1, "waiting"), n)
+        _report("  mixed (1 writer, 4 readers)", [("writes", writes), ("reads", reads)])
+        db.close_pool()
+
+
+# --- Query plans: every statement db.py issues must use an index ---
+# (function name, args). Covers every public read/write in db.py.
+PLAN_CALLS = [
+    ("add_request", (1, "user", "Other", None, "comment")),
+    ("add_request", (2, "user", "Other", None, "comment", None, "AgACAgQAAxk", "photo")),
+    ("update_status", (1, "accepted")),
+    ("update_status", (1, "done", "done!")),
+    ("update_permission", (1, 1)),
+    ("update_permission", (1, 0, "off")),
+    ("update_comment", (2, "edited")),
+    ("update_comment", (2, "edited again", 1)),
+    ("claim_request", (1, 42)),
+    ("update_status", (1, "waiting", None, 4, 42)),
+    ("update_status", (1, "waiting")),
+    ("release_request", (1, 42)),
+    ("get_request_by_id", (1,)),
+    ("get_request_summary", (1,)),
+    ("get_request_status", (1,)),
+    ("get_request_status", (1, 1)),
+    ("get_all_requests", ()),
+    ("get_waiting_requests", ()),
+    ("get_user_requests", (1,)),
+    ("get_requests_page", ()),
+    ("get_requests_page", (None, ("waiting",))),
+    ("get_requests_page", (None, ("waiting",), 500)),
+    ("get_requests_page", (None, ("waiting",), None, 500)),
+    ("get_requests_page", (1, ("waiting", "accepted"), 500)),
+    ("get_requests_page", (1, None, None, 10)),
+    ("search_requests", ("seed",)),
+    ("search_requests", ("seed comment", 10)),
+    ("search_requests", ("seed", 0, 10, 500)),
+    ("get_user_from_request", (1,)),
+    ("set_request_media", (1, "abc.pdf")),
+    ("add_media_blob", ("abc", "abc.pdf", 10)),
+    ("get_media_blob", ("abc",)),
+    ("get_media_usage", ()),
+    ("set_media_cold", ("abc", True)),
+    ("is_media_referenced", ("abc.pdf",)),
+    ("is_media_referenced", ("abc.pdf", True)),
+    ("delete_media_blob", ("abc",)),
+    ("get_request_stats", ()),
+    ("rebuild_request_stats", ()),
+    ("upsert_subscriber", (7, "user")),
+    ("upsert_subscriber", (7, "renamed")),
+    ("mark_subscriber_blocked", (7,)),
+    ("get_subscriber_count", ()),
+    ("get_subscriber_batch", (0, 100)),
+    ("create_broadcast", (1, 1, "hello", 10)),
+    ("set_broadcast_message", (1, 99)),
+    ("checkpoint_broadcast", (1, 20, 5, 1)),
+    ("get_running_broadcasts", ()),
+    ("finish_broadcast", (1,)),
+    ("get_due_outbox", (100,)),
+    ("retry_outbox", (1, 1, "2999-01-01")),
+    ("delete_outbox", ([1, 2],)),
+    ("iter_requests", ()),
+    ("iter_requests", (("done",), "Other", "2000-01-01", "2999-01-01")),
+    ("archive_requests", ("2999-01-01", 100)),
+    ("get_request_by_id", (1,)),
+    ("incremental_vacuum", (100,)),
+    ("save_persistence", ([("user", 1, b"x")], [("user", 2)], [("user", "[1, 1]", "2")], [("user", "[2, 2]")])),
+    ("load_persistence_data", ("user",)),
+    ("load_conversations", ("user",)),
+    ("add_admin", (42,)),
+    ("get_admins", ()),
+    ("is_admin", (42,)),
+    ("remove_admin", (42,)),
+    ("set_task_list", (["Software Task", "Other"],)),
+    ("add_task", ("Write Paper",)),
+    ("get_task_list", ()),
+    ("reload_task_catalog", ()),
+    ("remove_task", ("Write Paper",)),
+]
+
+# Maintenance functions that aggregate the whole table on purpose, and the
+# export: it streams live and archived rows merged in id order, and a status
+# or type index would instead sort every match in memory (temp_store) before
+# the first row; exports are rare and run on a connection of their own.
+FULL_SCAN_OK = {"rebuild_request_stats", "iter_requests"}
+
+
+def _plan_problems(conn, sql):
+    # Unfiltered statements (full listings, DELETE FROM t) are allowed to
+    # scan; anything with a WHERE must search an index, and nothing may
+    # sort through a temp b-tree.
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    filtered = " WHERE " in " ".join(sql.upper().split())
+    problems = [p for p in plan if "TEMP B-TREE" in p]
+    if filtered:
+        problems += [p for p in plan if p.startswith("SCAN") and "INDEX" not in p]
+    return plan, problems
+
+
+def _traced(conn, callback):
+    conn.set_trace_callback(callback)
+    return conn
+
+
+def bench_plans(rows=1000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "plans.db"), readers=1)
+        db.init_db()
+        for i in range(rows):
+            db.add_request(i % 50, "seed", "Other", None, "seed comment")
+        with db.write_connection() as conn:
+            # Spread rows over ~3 months so per-day stats look like production.
+            conn.execute("UPDATE requests SET created_at = date('now', '-' || (id % 90) || ' days')")
+        db.rebuild_request_stats()
+        with db.write_connection() as conn:
+            conn.execute("ANALYZE")
+
+        statements = {}
+        open_connection = db.open_connection
+        for name, args in PLAN_CALLS:
+            traced = []
+            db.get_pool().set_trace_callback(traced.append)
+            # iter_requests opens a connection of its own: trace that too.
+            db.open_connection = lambda *a: _traced(open_connection(*a), traced.append)
+            result = getattr(db, name)(*args)
+            if isinstance(result, types.GeneratorType):
+                list(result)
+            db.open_connection = open_connection
+            db.get_pool().set_trace_callback(None)
+            for sql in traced:
+                statements.setdefault(sql, name)
+
+        failures = 0
+        with db.read_connection() as conn:
+            for sql, name in statements.items():
+                verb = sql.lstrip().split(None, 1)[0].upper()
+                if verb not in ("SELECT", "UPDATE", "DELETE", "INSERT"):
+                    continue
+                plan, problems = _plan_problems(conn, sql)
+                if name in FULL_SCAN_OK:
+                    problems = []
+                status = "FAIL" if problems else "ok"
+                failures += bool(problems)
+                print(f"[{status}] {' '.join(sql.split())}")
+                for line in plan:
+                    print(f"       {line}")
+        db.close_pool()
+    if failures:
+        print(f"{failures} statement(s) not using an index")
+        sys.exit(1)
+
+
+# --- Delivery: polling vs webhook against a local fake Bot API ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _post_updates(url, secret, updates, concurrency=64):
+    # Runs in its own process so the load generator doesn't share the bot's CPU.
+    import httpx
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret}
+        async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+            async def post(update):
+                async with semaphore:
+                    await client.post(url, json=update, headers=headers)
+            await asyncio.gather(*(post(u) for u in updates))
+
+    asyncio.run(run())
+
+
+async def _drive(mode, n, latency):
+    import httpx
+    from fakebot import FakeBotAPI, TOKEN, message_update
+    from run import build_app
+
+    api = FakeBotAPI(latency=latency).start()
+    app = build_app(TOKEN, api.base_url)
+    # Every /start from a new user costs one subscriber upsert and one reply.
+    updates = [message_update(i + 1, 100_000 + i, "/start") for i in range(n)]
+    loop = asyncio.get_running_loop()
+
+    async with app:
+        await app.start()
+        if mode == "polling":
+            await app.updater.start_polling(poll_interval=0, timeout=1)
+            start = time.perf_counter()
+            for update in updates:
+                api.push_update(update)
+        else:
+            port, secret = _free_port(), "bench-secret"
+            url = f"http://127.0.0.1:{port}/telegram"
+            await app.updater.start_webhook(
+                listen="127.0.0.1", port=port, url_path="telegram", secret_token=secret, webhook_url=url
+            )
+            async with httpx.AsyncClient() as client:
+                bad = await client.post(url, json=updates[0], headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+                assert bad.status_code == 403, f"bad secret accepted: {bad.status_code}"
+            poster = multiprocessing.Process(target=_post_updates, args=(url, secret, updates))
+            start = time.perf_counter()
+            poster.start()
+
+        delivered = await loop.run_in_executor(None, api.wait_for_sent, n, 300)
+        elapsed = time.perf_counter() - start
+        if mode == "webhook":
+            poster.join()
+        await app.updater.stop()
+        await app.stop()
+    api.stop()
+    return n / elapsed if delivered else 0.0
+
+
+def bench_delivery(n=2000, latency_ms=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        for mode in ("polling", "webhook"):
+            db.configure(os.path.join(tmp, f"{mode}.db"))
+            db.init_db()
+            results.append((mode, asyncio.run(_drive(mode, n, latency_ms / 1000))))
+            db.close_pool()
+    _report(f"updates handled end-to-end (n={n}, fake API latency {latency_ms} ms)", results)
+
+
+# --- Persistence: per-update overhead of SQLitePersistence vs PicklePersistence ---
+def _user_data(uid, i):
+    return {"task_type": "Software Task", "comment": f"comment {uid} {i} " * 5, "media_file": None,
+            "listing": {"user_id": uid, "statuses": None, "title": "📜 Request History", "footer": "..."}}
+
+
+async def _persist_rounds(persistence, users, rounds, changed):
+    # Each round PTB hands over every user touched since the last run; only
+    # `changed` of them actually modified their data.
+    start = time.perf_counter()
+    for r in range(rounds):
+        for uid in range(users):
+            await persistence.update_user_data(uid, _user_data(uid, r if uid < changed else 0))
+            await persistence.update_conversation("user", (uid, uid), (r + uid) % 8 if uid < changed else 1)
+        await persistence.flush()
+    return (time.perf_counter() - start) / (rounds * users) * 1e6
+
+
+async def _bench_persistence(tmp, users, rounds, changed):
+    from telegram.ext import PicklePersistence
+    from persistence import SQLitePersistence
+
+    results = []
+    sqlite_us = await _persist_rounds(SQLitePersistence(), users, rounds, changed)
+    results.append(("SQLitePersistence", sqlite_us))
+
+    start = time.perf_counter()
+    loaded = SQLitePersistence()
+    data = await loaded.get_user_data()
+    states = await loaded.get_conversations("user")
+    load_ms = (time.perf_counter() - start) * 1000
+    assert len(data) == users and len(states) == users
+
+    pickle_persistence = PicklePersistence(os.path.join(tmp, "bench.pickle"))
+    await pickle_persistence.get_user_data()
+    await pickle_persistence.get_conversations("user")
+    pickle_rounds = max(1, rounds // 10)  # rewrites the whole file per call: too slow for more
+    results.append(("PicklePersistence", await _persist_rounds(pickle_persistence, users, pickle_rounds, changed)))
+    return results, load_ms
+
+
+def bench_persistence(users=1000, rounds=20, changed=100):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "persistence.db"))
+        db.init_db()
+        results, load_ms = asyncio.run(_bench_persistence(tmp, users, rounds, changed))
+        db.close_pool()
+    print(f"per-update overhead ({users} users touched per run, {changed} changed)")
+    for name, us in results:
+        print(f"  {name:<28} {us:>12,.1f} µs/update")
+    print(f"  startup load ({users} users)  {load_ms:>12,.1f} ms")
+
+
+# --- Cluster: throughput vs number of worker processes ---
+async def _drive_cluster(workers, n, latency):
+    import cluster
+    from fakebot import FakeBotAPI, TOKEN, message_update
+
+    cluster.POLL_TIMEOUT = 1
+    api = FakeBotAPI(latency=latency).start()
+    supervisor = cluster.Supervisor(workers, TOKEN, api.base_url)
+    runner = asyncio.create_task(supervisor.run())
+    loop = asyncio.get_running_loop()
+
+    # Warm up: wait until every worker has answered once.
+    for i in range(workers):
+        api.push_update(message_update(i + 1, i, "/start"))
+    await loop.run_in_executor(None, api.wait_for_sent, workers, 120)
+
+    base = len(api.sent)
+    start = time.perf_counter()
+    for i in range(n):
+        api.push_update(message_update(workers + i + 1, 200_000 + i, "/start"))
+    delivered = await loop.run_in_executor(None, api.wait_for_sent, base + n, 300)
+    elapsed = time.perf_counter() - start
+
+    supervisor.stop()
+    await runner
+    api.stop()
+    return n / elapsed if delivered else 0.0
+
+
+def bench_cluster(n=2000, latency_ms=20, max_workers=4):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workers = 1
+        while workers <= max_workers:
+            db.configure(os.path.join(tmp, f"cluster{workers}.db"))
+            db.init_db()
+            results.append((f"{workers} worker(s)", asyncio.run(_drive_cluster(workers, n, latency_ms / 1000))))
+            db.close_pool()
+            workers *= 2
+    _report(f"updates handled end-to-end (n={n}, fake API latency {latency_ms} ms, {os.cpu_count()} cores)", results)
+
+
+# --- Search: FTS5 query latency on a large table ---
+SEARCH_SUBJECTS = ["java", "python", "calculus", "physics", "history", "marketing", "database", "networks"]
+SEARCH_WORDS = ["assignment", "report", "project", "slides", "essay", "homework", "lab", "exam"]
+SEARCH_FILLER = [f"w{i}" for i in range(20000)]  # long tail of rarer words
+
+
+def _seed_search(rows):
+    import random
+    rng = random.Random(42)
+    task_types = ["Software Task", "Write Paper", "Make Presentation", "Other"]
+
+    def row(i):
+        words = [rng.choice(SEARCH_SUBJECTS), rng.choice(SEARCH_WORDS)]
+        words += [rng.choice(SEARCH_FILLER) for _ in range(rng.randint(4, 16))]
+        rng.shuffle(words)
+        return (i % 50000, f"user{i % 50000}", rng.choice(task_types), " ".join(words), "waiting", "2024-01-01")
+
+    with db.write_connection() as conn:
+        conn.executemany(
+            "INSERT INTO requests (user_id, username, task_type, comment, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (row(i) for i in range(rows))
+        )
+        conn.execute("INSERT INTO requests_fts (requests_fts) VALUES ('optimize')")
+
+
+def _latency_ms(fn, n=50):
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.95)]
+
+
+def bench_search(rows=1_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "search.db"), readers=1)
+        db.init_db()
+        start = time.perf_counter()
+        _seed_search(rows)
+        print(f"seeded {rows:,} requests in {time.perf_counter() - start:.1f}s")
+
+        queries = [
+            ("rare word", "w123"),
+            ("rare word, page 3", "w123", 20),
+            ("two rare words", "w123 w456"),
+            ("subject + rare word", "java w77"),
+            ("username", "user4242"),
+            ("subject + kind", "java assignment"),
+            ("common word", "java"),
+            ("common word, page 5", "java", 40),
+        ]
+        print(f"{'query':<24} {'matches':>9} {'p50 ms':>9} {'p95 ms':>9}  (newest {db.SEARCH_CANDIDATES} ranked)")
+        for name, text, *offset in queries:
+            with db.read_connection() as conn:
+                matches = conn.execute(
+                    "SELECT COUNT(*) FROM requests_fts WHERE requests_fts MATCH ?", (db._match_query(text),)
+                ).fetchone()[0]
+            p50, p95 = _latency_ms(lambda: db.search_requests(text, *offset))
+            print(f"{name:<24} {matches:>9,} {p50:>9.2f} {p95:>9.2f}")
+
+        with db.read_connection() as conn:
+            ids = [r[0] for r in conn.execute("SELECT id FROM requests ORDER BY random() LIMIT 200")]
+        start = time.perf_counter()
+        for i in ids:
+            db.update_comment(i, f"updated java w{i % 20000} lab")
+        print(f"update_comment with FTS sync: {(time.perf_counter() - start) / len(ids) * 1000:.2f} ms/update")
+        db.close_pool()
+
+
+# --- Rows: SELECT * tuples vs named rows vs narrow projections ---
+def _fetch_stats(fn, repeat=5):
+    import tracemalloc
+    tracemalloc.start()
+    rows = fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del rows
+    start = time.perf_counter()
+    for _ in range(repeat):
+        count = len(fn())
+    return count * repeat / (time.perf_counter() - start), peak / 1024 ** 2
+
+
+def bench_rows(rows=200_000, fetch=10_000):
+    import random
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "rows.db"), readers=1)
+        db.init_db()
+        with db.write_connection() as conn:
+            conn.executemany(
+                "INSERT INTO requests (user_id, username, task_type, comment, media, status, created_at) "
+                "VALUES (?, ?, 'Software Task', ?, ?, 'waiting', ?)",
+                ((i % 5000, f"user{i % 5000}", "x" * rng.randint(200, 1000), f"{i:064x}.pdf",
+                  datetime.now().isoformat()) for i in range(rows))
+            )
+
+        listing = f"SELECT id, user_id, task_type, status, {db.PREVIEW_SQL}, can_message, claimed_by, version FROM requests"
+        cases = [
+            ("SELECT * tuples", lambda c: c.execute("SELECT * FROM requests ORDER BY id DESC LIMIT ?", (fetch,))),
+            ("Request (all columns)", lambda c: db._fetch(c, db.Request, f"{db.SELECT_REQUEST} ORDER BY id DESC LIMIT ?", (fetch,))),
+            ("RequestSummary (preview)", lambda c: db._fetch(c, db.RequestSummary, f"{listing} ORDER BY id DESC LIMIT ?", (fetch,))),
+        ]
+        print(f"fetching {fetch:,} of {rows:,} requests (comments 200-1000 chars)")
+        print(f"  {'':<28} {'rows/sec':>12} {'peak MB':>9}")
+        with db.read_connection() as conn:
+            for name, query in cases:
+                rate, peak = _fetch_stats(lambda: query(conn).fetchall())
+                print(f"  {name:<28} {rate:>12,.0f} {peak:>9.1f}")
+        db.close_pool()
+
+
+# --- Export: streaming gzip CSV/JSONL, memory vs row count ---
+def bench_export(rows=1_000_000):
+    import random
+    import tracemalloc
+    import export
+    rng = random.Random(11)
+    statuses = ["waiting", "accepted", "done", "denied"]
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "export.db"), readers=1)
+        db.init_db()
+        with db.write_connection() as conn:
+            conn.executemany(
+                "INSERT INTO requests (user_id, username, task_type, comment, status, created_at) "
+                "VALUES (?, ?, 'Software Task', ?, ?, ?)",
+                ((i % 5000, f"user{i % 5000}", "x" * rng.randint(50, 500), rng.choice(statuses),
+                  f"2024-{i % 12 + 1:02d}-01") for i in range(rows))
+            )
+        print(f"exporting from {rows:,} requests")
+        print(f"  {'':<34} {'rows':>10} {'rows/sec':>10} {'file MB':>8} {'peak MB':>8}")
+        cases = [
+            ("csv, 1k rows", "csv", {"until": "2024-01-01T00:00:01"}, 1000),
+            ("csv, all rows", "csv", {}, None),
+            ("jsonl, all rows", "jsonl", {}, None),
+            ("csv, status=done from=2024-06", "csv", {"statuses": ("done",), "since": "2024-06-01"}, None),
+        ]
+        for name, fmt, filters, limit in cases:
+            rows_iter = db.iter_requests(**filters)
+            if limit:
+                rows_iter = (row for _, row in zip(range(limit), rows_iter))
+            path = os.path.join(tmp, f"out.{fmt}.gz")
+            tracemalloc.start()
+            start = time.perf_counter()
+            count = export.write_export(path, rows_iter, fmt)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {name:<34} {count:>10,} {count / elapsed:>10,.0f} "
+                  f"{os.path.getsize(path) / 1024 ** 2:>8.1f} {peak / 1024 ** 2:>8.2f}")
+        db.close_pool()
+
+
+# --- Writes: one transaction per call vs group commit, concurrent submitters ---
+async def _submitters(add, set_status, concurrency, per_task):
+    async def submitter(k):
+        for i in range(per_task):
+            request_id = await add(k, "bench", "Other", None, f"comment {i}")
+            await set_status(request_id, "accepted")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(submitter(k) for k in range(concurrency)))
+    return concurrency * per_task * 2 / (time.perf_counter() - start)
+
+
+def bench_writes(total=4000):
+    import async_db
+    per_call = (async_db._in_db_thread(db.add_request), async_db._in_db_thread(db.update_status))
+    grouped = (async_db.add_request, async_db.update_status)
+    with tempfile.TemporaryDirectory() as tmp:
+        for sync in ("NORMAL", "FULL"):
+            db.configure(os.path.join(tmp, f"writes-{sync}.db"))
+            db.init_db()
+            with db.write_connection() as conn:
+                conn.execute(f"PRAGMA synchronous={sync}")
+            print(f"add_request + update_status, synchronous={sync} ({total:,} writes per run)")
+            print(f"  {'submitters':>10} {'per-call writes/s':>18} {'grouped writes/s':>17}")
+            for concurrency in (1, 8, 64, 256):
+                per_task = max(1, total // 2 // concurrency)
+                single = asyncio.run(_submitters(*per_call, concurrency, per_task))
+                group = asyncio.run(_submitters(*grouped, concurrency, per_task))
+                print(f"  {concurrency:>10} {single:>18,.0f} {group:>17,.0f}")
+            db.close_pool()
+
+
+# --- Request cache: id lookups with and without the LRU ---
+def bench_cache(rows=100_000, n=50_000):
+    import random
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "cache.db"), readers=1)
+        db.init_db()
+        with db.write_connection() as conn:
+            conn.executemany(
+                "INSERT INTO requests (user_id, username, task_type, comment, status, created_at) "
+                "VALUES (?, ?, 'Other', ?, 'waiting', '2024-01-01')",
+                ((i % 5000, f"user{i % 5000}", "x" * rng.randint(50, 500)) for i in range(rows))
+            )
+        # Admins and users mostly reopen recent requests: 90% of lookups hit the newest 2,000.
+        ids = [rng.randint(rows - 2000, rows) if rng.random() < 0.9 else rng.randint(1, rows) for _ in range(n)]
+        results = []
+        for size in (0, db.REQUEST_CACHE_SIZE):
+            db.request_cache.resize(size)
+            db.request_cache.clear()
+            db.request_cache.hits = db.request_cache.misses = 0
+            rate = _rate(lambda i: db.get_request_summary(ids[i]), n)
+            hit_rate = db.request_cache.hits / n * 100
+            results.append((f"cache size {size} ({hit_rate:.0f}% hits)", rate))
+        _report(f"get_request_summary, {n:,} lookups over {rows:,} requests", results)
+        db.request_cache.resize(db.REQUEST_CACHE_SIZE)
+        db.close_pool()
+
+
+BENCHMARKS = {
+    "connections": bench_connections,
+    "plans": bench_plans,
+    "delivery": bench_delivery,
+    "persistence": bench_persistence,
+    "cluster": bench_cluster,
+    "search": bench_search,
+    "rows": bench_rows,
+    "export": bench_export,
+    "writes": bench_writes,
+    "cache": bench_cache,
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("usage: python bench.py {" + ",".join(BENCHMARKS) + "} [n]")
+        sys.exit(1)
+    args = [int(a) for a in sys.argv[2:]]
+    BENCHMARKS[sys.argv[1]](*args)
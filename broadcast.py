@@ -0,0 +1,143 @@
+# broadcast.py
+
+import asyncio
+import time
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from async_db import (
+    get_subscriber_count, get_subscriber_batch, mark_subscriber_blocked,
+    create_broadcast, set_broadcast_message, checkpoint_broadcast,
+    finish_broadcast, get_running_broadcasts
+)
+from background import BackgroundTasks
+
+BATCH_SIZE = 200       # subscribers per checkpoint
+CONCURRENCY = 20       # sends in flight per broadcast
+RATE_LIMIT = 25        # messages/sec across all broadcasts (Telegram allows ~30)
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 5  # seconds between progress edits
+
+
+# --- Global Rate Limit ---
+class RateLimiter:
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = float(rate)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    # Telegram's RetryAfter applies to the whole bot, so every sender waits.
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+limiter = RateLimiter(RATE_LIMIT)
+
+
+def retry_seconds(retry_after):
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else retry_after
+
+
+async def _deliver(bot, user_id, text):
+    for _ in range(MAX_ATTEMPTS):
+        await limiter.wait()
+        try:
+            await bot.send_message(user_id, text)
+            return True
+        except RetryAfter as e:
+            limiter.pause(retry_seconds(e.retry_after))
+        except Forbidden:
+            # User blocked the bot: skip them in future broadcasts.
+            await mark_subscriber_blocked(user_id)
+            return False
+        except TelegramError:
+            return False
+    return False
+
+
+def _progress_text(job_id, total, sent, failed, done=False):
+    head = f"✅ Broadcast #{job_id} finished" if done else f"📢 Broadcast #{job_id} in progress"
+    return f"{head}\n{sent + failed}/{total} processed\n✅ Sent: {sent}\n❌ Failed: {failed}"
+
+
+async def _report(bot, chat_id, message_id, text):
+    try:
+        if message_id:
+            await bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+        else:
+            await bot.send_message(chat_id, text)
+    except TelegramError:
+        pass
+
+
+# --- Worker ---
+# Delivery is at-least-once: after a crash the batch in flight is resent.
+async def run_broadcast(bot, job):
+    job_id, chat_id, message_id, text, cursor, total, sent, failed = job
+    message = f"📢 Announcement:\n\n{text}"
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    last_report = time.monotonic()
+
+    async def send(user_id):
+        async with semaphore:
+            return await _deliver(bot, user_id, message)
+
+    while True:
+        batch = await get_subscriber_batch(cursor, BATCH_SIZE)
+        if not batch:
+            break
+        results = await asyncio.gather(*(send(uid) for uid in batch))
+        sent += sum(results)
+        failed += len(results) - sum(results)
+        cursor = batch[-1]
+        await checkpoint_broadcast(job_id, cursor, sent, failed)
+
+        if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            await _report(bot, chat_id, message_id, _progress_text(job_id, total, sent, failed))
+
+    await finish_broadcast(job_id)
+    await _report(bot, chat_id, message_id, _progress_text(job_id, total, sent, failed, done=True))
+
+
+# --- Entry Points ---
+# Jobs cancelled on stop resume from their checkpoint.
+_tasks = BackgroundTasks()
+
+
+def _spawn(bot, job):
+    _tasks.spawn(run_broadcast(bot, job))
+
+
+async def start_broadcast(application, admin_id, chat_id, text):
+    total = await get_subscriber_count()
+    job_id = await create_broadcast(admin_id, chat_id, text, total)
+    progress = await application.bot.send_message(chat_id, _progress_text(job_id, total, 0, 0))
+    await set_broadcast_message(job_id, progress.message_id)
+    job = (job_id, chat_id, progress.message_id, text, 0, total, 0, 0)
+    _spawn(application.bot, job)
+    return job_id
+
+
+async def resume_broadcasts(application):
+    for job in await get_running_broadcasts():
+        _spawn(application.bot, job)
+
+
+async def stop():
+    await _tasks.stop()
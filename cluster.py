@@ -0,0 +1,157 @@
+# cluster.py
+# Multi-process mode: a supervisor long-polls Telegram and routes each update
+# to one of N worker processes by user id, so every user's updates are
+# handled in order by the same worker. Workers share tasks.db (WAL,
+# busy_timeout) and are restarted if they die.
+
+import asyncio
+import logging
+import multiprocessing
+import httpx
+from telegram import Update
+import db
+from async_db import flush_writes, reload_admin_ids, reload_task_catalog
+from config import BOT_TOKEN, METRICS_PORT, PROFILER_ENABLED
+import media
+import metrics
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.telegram.org/bot"
+POLL_TIMEOUT = 30         # getUpdates long-poll seconds
+WATCH_INTERVAL = 1        # seconds between worker liveness checks
+CACHE_REFRESH_INTERVAL = 10  # seconds; bounds how stale per-process caches get
+
+
+# --- Routing ---
+def shard_for(update, workers):
+    for key, value in update.items():
+        if key != "update_id" and isinstance(value, dict):
+            user = value.get("from") or value.get("user") or value.get("chat") or {}
+            if "id" in user:
+                return user["id"] % workers
+    return update["update_id"] % workers
+
+
+# --- Worker Process ---
+async def _refresh_caches():
+    # Admins and task types changed by another worker become visible here.
+    while True:
+        await asyncio.sleep(CACHE_REFRESH_INTERVAL)
+        await reload_admin_ids()
+        await reload_task_catalog()
+
+
+async def _worker(token, base_url, queue, index):
+    from run import build_app  # run imports this module
+
+    app = build_app(token, base_url)
+    loop = asyncio.get_running_loop()
+    background = index == 0
+    async with app:
+        await app.start()
+        metrics.start(METRICS_PORT and METRICS_PORT + index, profiler_enabled=PROFILER_ENABLED)
+        # One worker owns the background jobs (broadcast resume, ...).
+        if background and app.post_init:
+            await app.post_init(app)
+        refresher = asyncio.create_task(_refresh_caches())
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            await app.update_queue.put(Update.de_json(data, app.bot))
+        refresher.cancel()
+        if background and app.post_stop:
+            await app.post_stop(app)
+        await media.stop()  # every worker downloads media
+        metrics.stop()
+        await app.stop()
+        await flush_writes()  # writes queued by the last updates
+
+
+def _worker_main(token, base_url, db_path, queue, index):
+    logging.basicConfig(level=logging.WARNING)
+    db.configure(db_path)
+    db.request_cache.resize(0)  # other workers' writes would leave it stale
+    asyncio.run(_worker(token, base_url, queue, index))
+
+
+# --- Supervisor ---
+class Supervisor:
+    def __init__(self, workers, token=BOT_TOKEN, base_url=None):
+        self.token = token
+        self.base_url = base_url or API_URL
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queues = [self._ctx.Queue() for _ in range(workers)]
+        self._procs = [None] * workers
+        self._stopping = False
+        self.restarts = 0
+
+    def _spawn(self, index):
+        # A worker killed inside queue.get() leaves the queue's read lock held,
+        # so every (re)start gets a fresh queue. Updates still queued for a
+        # dead worker are lost.
+        self._queues[index] = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self.token, self.base_url, db.DB_NAME, self._queues[index], index),
+            name=f"worker-{index}",
+            daemon=True,
+        )
+        proc.start()
+        self._procs[index] = proc
+
+    async def _watch(self):
+        while not self._stopping:
+            await asyncio.sleep(WATCH_INTERVAL)
+            for index, proc in enumerate(self._procs):
+                if not self._stopping and not proc.is_alive():
+                    logger.warning("%s exited with %s, restarting", proc.name, proc.exitcode)
+                    self.restarts += 1
+                    self._spawn(index)
+
+    async def run(self):
+        for index in range(len(self._procs)):
+            self._spawn(index)
+        watcher = asyncio.create_task(self._watch())
+        api = f"{self.base_url}{self.token}"
+        offset = 0
+        try:
+            async with httpx.AsyncClient(timeout=POLL_TIMEOUT + 10) as client:
+                await client.post(f"{api}/deleteWebhook")
+                while not self._stopping:
+                    try:
+                        resp = await client.post(
+                            f"{api}/getUpdates", json={"offset": offset, "timeout": POLL_TIMEOUT}
+                        )
+                        updates = resp.json()["result"]
+                    except (httpx.HTTPError, KeyError, ValueError):
+                        logger.exception("getUpdates failed")
+                        await asyncio.sleep(1)
+                        continue
+                    for update in updates:
+                        offset = update["update_id"] + 1
+                        self._queues[shard_for(update, len(self._queues))].put(update)
+        finally:
+            watcher.cancel()
+            await self._shutdown()
+
+    def stop(self):
+        self._stopping = True
+
+    async def _shutdown(self):
+        self._stopping = True
+        for queue in self._queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for proc in self._procs:
+            await loop.run_in_executor(None, proc.join, 30)
+
+
+def run_cluster(workers):
+    print(f"✅ Bot is running ({workers} worker processes)...")
+    supervisor = Supervisor(workers)
+    try:
+        asyncio.run(supervisor.run())
+    except KeyboardInterrupt:
+        pass
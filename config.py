@@ -1,4 +1,30 @@
 # config.py
 MAIN_ADMIN_ID = 1292288560  # Replace with your real main admin ID
 ADMIN_IDS = [MAIN_ADMIN_ID]  # Add other normal admin IDs
-BOT_TOKEN = "7901558509:AAHZMuCcck5Rh5Ou7bsdsL9YQj6nUwjgvnE"
\ No newline at end of file
+BOT_TOKEN = "7901558509:AAHZMuCcck5Rh5Ou7bsdsL9YQj6nUwjgvnE"
+
+# Update delivery: "polling" or "webhook"
+MODE = "polling"
+CONCURRENT_UPDATES = 32  # updates handled at once (always in order per user)
+WORKERS = 1  # > 1 (polling only): shard updates by user id across this many processes
+
+# Webhook mode: Telegram POSTs updates to WEBHOOK_URL/WEBHOOK_PATH, which the
+# bot's own HTTP server (WEBHOOK_LISTEN:WEBHOOK_PORT) receives, e.g. behind nginx.
+WEBHOOK_URL = ""  # public https base URL, e.g. "https://bot.example.com"
+WEBHOOK_PATH = "telegram"
+WEBHOOK_LISTEN = "127.0.0.1"
+WEBHOOK_PORT = 8443
+WEBHOOK_SECRET = ""  # checked against X-Telegram-Bot-Api-Secret-Token; required in webhook mode
+
+# Prometheus metrics on http://127.0.0.1:METRICS_PORT/metrics (0 disables).
+# With WORKERS > 1, worker i listens on METRICS_PORT + i.
+METRICS_PORT = 9108
+PROFILER_ENABLED = False  # also serve /profile?seconds=N (stack sampling)
+
+# Lazy media keeps only the Telegram file_id and never downloads to media/;
+# attachments are always re-sent by id.
+LAZY_MEDIA = False
+
+# Requests closed (done / denied / cancelled) longer than this move to
+# tasks_archive.db, and media only they use to media_cold/ (0 disables).
+ARCHIVE_AFTER_DAYS = 90
@@ -1,145 +1,1240 @@
+import os
+import queue
 import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 from datetime import datetime
+from config import ADMIN_IDS, MAIN_ADMIN_ID
 
 DB_NAME = 'tasks.db'
+READER_COUNT = 4
+PAGE_SIZE = 10
+PREVIEW_LEN = 20
+SEARCH_CANDIDATES = 1000
+
+# Applied to every pooled connection. WAL lets readers run while the writer
+# commits; NORMAL sync is durable across app crashes in WAL mode.
+PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL",  # takes effect when the file is created
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA cache_size=-16000",    # 16 MB
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+# --- Row Types ---
+# Request reads name their columns (no SELECT *) and come back as named
+# tuples: Request is the full row for detail views; RequestSummary is what
+# listings need, with the comment cut to a preview in SQL.
+REQUEST_COLUMNS = (
+    "id", "user_id", "username", "task_type", "sub_type", "comment", "media",
+    "status", "can_message", "created_at", "media_file_id", "media_kind", "status_changed_at",
+    "version", "claimed_by",
+)
+Request = namedtuple("Request", REQUEST_COLUMNS)
+RequestSummary = namedtuple("RequestSummary", "id user_id task_type status preview can_message claimed_by version")
+
+REQUEST_FIELDS = ", ".join(REQUEST_COLUMNS)
+SELECT_REQUEST = f"SELECT {REQUEST_FIELDS} FROM requests"
+PREVIEW_SQL = f'''CASE WHEN length(comment) > {PREVIEW_LEN}
+                    THEN substr(comment, 1, {PREVIEW_LEN}) || '...'
+                    ELSE COALESCE(comment, '') END'''
+
+
+def _preview(comment):
+    if comment is not None and len(comment) > PREVIEW_LEN:
+        return comment[:PREVIEW_LEN] + "..."
+    return comment or ""
+
+
+def _fetch(conn, row_type, sql, params=()):
+    cursor = conn.cursor()
+    # tuple.__new__ skips namedtuple._make's extra call per row.
+    cursor.row_factory = lambda _, row: tuple.__new__(row_type, row)
+    return cursor.execute(sql, params)
 
 
 # --- Base Connection ---
-def get_connection():
-    return sqlite3.connect(DB_NAME)
+# Closed requests are moved to <name>_archive.db, attached as `archive` on
+# every connection (see Archive below).
+def archive_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}_archive{ext}"
 
 
-# --- Initialize All Tables ---
-def init_db():
-    with get_connection() as conn:
-        c = conn.cursor()
+def open_connection(path=None):
+    path = path or DB_NAME
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(path),))
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    conn.execute("PRAGMA archive.synchronous=NORMAL")
+    return conn
 
-        # Requests Table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                username TEXT,
-                task_type TEXT,
-                sub_type TEXT,
-                comment TEXT,
-                media TEXT,
-                status TEXT DEFAULT 'waiting',
-                can_message INTEGER DEFAULT 0,
-                created_at TEXT
-            )
-        ''')
 
-        # Admins Table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS admins (
-                admin_id INTEGER PRIMARY KEY
-            )
-        ''')
+# One writer connection (serialised by a lock) plus N reader connections,
+# all opened once and reused for the life of the process.
+class ConnectionPool:
+    def __init__(self, path, readers=READER_COUNT):
+        self.path = path
+        self._writer = open_connection(path)
+        self._write_lock = threading.Lock()
+        self._batch_thread = None  # thread running write_batch, if any
+        self._write_thread = None  # thread inside a plain write block, if any
+        self._commit_callbacks = []
+        self._readers = queue.LifoQueue()
+        for _ in range(readers):
+            self._readers.put(open_connection(path))
+        self._reader_count = readers
 
-        # Task List Table
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS task_list (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                task_name TEXT UNIQUE NOT NULL
+    @contextmanager
+    def write(self):
+        if self._batch_thread == threading.get_ident():
+            # Inside write_batch: the batch owns the transaction, each call
+            # gets a savepoint so a failing one doesn't undo the others.
+            self._writer.execute("SAVEPOINT batch_call")
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute("ROLLBACK TO batch_call")
+                raise
+            finally:
+                self._writer.execute("RELEASE batch_call")
+            return
+        with self._write_lock:
+            self._write_thread = threading.get_ident()
+            try:
+                with self._writer:
+                    yield self._writer
+            except BaseException:
+                self._commit_callbacks.clear()  # rolled back
+                raise
+            finally:
+                self._write_thread = None
+            callbacks, self._commit_callbacks = self._commit_callbacks, []
+            for callback in callbacks:
+                callback()
+
+    # Group commit: runs each write function in `calls` in one transaction
+    # with a single commit. Returns (result, exception) per call. Functions
+    # run here must not commit themselves.
+    def write_batch(self, calls):
+        results = []
+        with self._write_lock:
+            self._batch_thread = threading.get_ident()
+            try:
+                with self._writer:
+                    self._writer.execute("BEGIN IMMEDIATE")
+                    for call in calls:
+                        try:
+                            results.append((call(), None))
+                        except Exception as e:
+                            results.append((None, e))
+            finally:
+                self._batch_thread = None
+                callbacks, self._commit_callbacks = self._commit_callbacks, []
+                for callback in callbacks:
+                    callback()
+        return results
+
+    # Runs `callback` once the current write is committed, still holding the
+    # write lock: at the end of the write block (dropped if it rolls back) or
+    # of the batch inside write_batch; right away outside of both.
+    def after_commit(self, callback):
+        if threading.get_ident() in (self._batch_thread, self._write_thread):
+            self._commit_callbacks.append(callback)
+        else:
+            callback()
+
+    def set_trace_callback(self, callback):
+        with self._write_lock:
+            self._writer.set_trace_callback(callback)
+        readers = [self._readers.get() for _ in range(self._reader_count)]
+        for conn in readers:
+            conn.set_trace_callback(callback)
+            self._readers.put(conn)
+
+    @contextmanager
+    def read(self):
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        for _ in range(self._reader_count):
+            self._readers.get().close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_NAME)
+    return _pool
+
+
+# Point the module at another database file (scripts, benchmarks).
+def configure(path, readers=READER_COUNT):
+    global DB_NAME, _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        DB_NAME = path
+        _pool = ConnectionPool(path, readers)
+    request_cache.clear()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def write_connection():
+    return get_pool().write()
+
+
+def write_batch(calls):
+    return get_pool().write_batch(calls)
+
+
+def read_connection():
+    return get_pool().read()
+
+
+# --- Schema Migrations ---
+# Recomputes request_stats from scratch with GROUP BY (migration 3 and
+# rebuild_request_stats).
+REBUILD_STATS_SQL = '''
+    DELETE FROM request_stats;
+    INSERT INTO request_stats (kind, key, count)
+        SELECT 'total', '', COUNT(*) FROM requests;
+    INSERT INTO request_stats (kind, key, count)
+        SELECT 'status', COALESCE(status, ''), COUNT(*) FROM requests GROUP BY 2;
+    INSERT INTO request_stats (kind, key, count)
+        SELECT 'task_type', COALESCE(task_type, ''), COUNT(*) FROM requests GROUP BY 2;
+    INSERT INTO request_stats (kind, key, count)
+        SELECT 'day', COALESCE(substr(created_at, 1, 10), ''), COUNT(*) FROM requests GROUP BY 2;
+'''
+
+# MIGRATIONS[i] upgrades a database from user_version i to i + 1. Append new
+# steps at the end; never edit one that has shipped. Step 1 uses
+# IF NOT EXISTS so databases created before migrations upgrade in place.
+MIGRATIONS = [
+    # 1: base tables
+    '''
+    CREATE TABLE IF NOT EXISTS requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        username TEXT,
+        task_type TEXT,
+        sub_type TEXT,
+        comment TEXT,
+        media TEXT,
+        status TEXT DEFAULT 'waiting',
+        can_message INTEGER DEFAULT 0,
+        created_at TEXT
+    );
+    CREATE TABLE IF NOT EXISTS admins (
+        admin_id INTEGER PRIMARY KEY
+    );
+    CREATE TABLE IF NOT EXISTS task_list (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_name TEXT UNIQUE NOT NULL
+    );
+    ''',
+    # 2: indexes for per-user history, status listings and the broadcast user scan
+    '''
+    CREATE INDEX IF NOT EXISTS idx_requests_user ON requests (user_id, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_requests_status ON requests (status, id DESC);
+    ''',
+    # 3: request_stats counters, kept current by triggers. Counts are
+    # all-time: archiving deletes rows from requests without decrementing.
+    '''
+    CREATE TABLE IF NOT EXISTS request_stats (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS trg_request_stats_insert AFTER INSERT ON requests
+    BEGIN
+        INSERT INTO request_stats (kind, key, count) VALUES
+            ('total', '', 1),
+            ('status', COALESCE(NEW.status, ''), 1),
+            ('task_type', COALESCE(NEW.task_type, ''), 1),
+            ('day', COALESCE(substr(NEW.created_at, 1, 10), ''), 1)
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_request_stats_status AFTER UPDATE OF status ON requests
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        UPDATE request_stats SET count = count - 1
+        WHERE kind = 'status' AND key = COALESCE(OLD.status, '');
+        INSERT INTO request_stats (kind, key, count) VALUES ('status', COALESCE(NEW.status, ''), 1)
+        ON CONFLICT (kind, key) DO UPDATE SET count = count + 1;
+    END;
+    ''' + REBUILD_STATS_SQL,
+    # 4: broadcast recipients and resumable broadcast jobs
+    '''
+    CREATE TABLE IF NOT EXISTS subscribers (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        blocked INTEGER NOT NULL DEFAULT 0,
+        first_seen TEXT,
+        last_seen TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_subscribers_blocked ON subscribers (blocked, user_id);
+    INSERT OR IGNORE INTO subscribers (user_id, username, first_seen, last_seen)
+        SELECT user_id, MAX(username), MIN(created_at), MAX(created_at)
+        FROM requests WHERE user_id IS NOT NULL GROUP BY user_id;
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        admin_id INTEGER,
+        chat_id INTEGER,
+        message_id INTEGER,
+        text TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'running',
+        cursor INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        sent INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT,
+        finished_at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts (status);
+    ''',
+    # 5: content-addressed media store (files live in media/<file_name>)
+    '''
+    CREATE TABLE IF NOT EXISTS media_blobs (
+        sha256 TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at TEXT
+    ) WITHOUT ROWID;
+    ''',
+    # 6: Telegram file_id and kind (photo / document / voice) of the attachment
+    '''
+    ALTER TABLE requests ADD COLUMN media_file_id TEXT;
+    ALTER TABLE requests ADD COLUMN media_kind TEXT;
+    ''',
+    # 7: bot persistence (user/chat/bot data and conversation states)
+    '''
+    CREATE TABLE IF NOT EXISTS persistence_data (
+        kind TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (kind, id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS persistence_conversations (
+        name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        state TEXT NOT NULL,
+        PRIMARY KEY (name, key)
+    ) WITHOUT ROWID;
+    ''',
+    # 8: transactional outbox of user notifications (see outbox.py)
+    '''
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (next_attempt_at);
+    CREATE INDEX IF NOT EXISTS idx_outbox_chat ON outbox (chat_id, next_attempt_at);
+    ''',
+    # 9: full-text index over comment, task type and username (external
+    # content: the text lives only in requests, triggers keep it in sync)
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS requests_fts USING fts5 (
+        comment, task_type, username,
+        content='requests', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS trg_requests_fts_insert AFTER INSERT ON requests
+    BEGIN
+        INSERT INTO requests_fts (rowid, comment, task_type, username)
+        VALUES (NEW.id, NEW.comment, NEW.task_type, NEW.username);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_requests_fts_delete AFTER DELETE ON requests
+    BEGIN
+        INSERT INTO requests_fts (requests_fts, rowid, comment, task_type, username)
+        VALUES ('delete', OLD.id, OLD.comment, OLD.task_type, OLD.username);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_requests_fts_update AFTER UPDATE OF comment, task_type, username ON requests
+    BEGIN
+        INSERT INTO requests_fts (requests_fts, rowid, comment, task_type, username)
+        VALUES ('delete', OLD.id, OLD.comment, OLD.task_type, OLD.username);
+        INSERT INTO requests_fts (rowid, comment, task_type, username)
+        VALUES (NEW.id, NEW.comment, NEW.task_type, NEW.username);
+    END;
+    INSERT INTO requests_fts (requests_fts) VALUES ('rebuild');
+    ''',
+    # 10: seed the task catalog with the types the bot used to hard-code
+    '''
+    INSERT INTO task_list (task_name)
+        SELECT column1 FROM (VALUES ('Software Task'), ('Write Paper'), ('Make Presentation'), ('Other'))
+        WHERE NOT EXISTS (SELECT 1 FROM task_list);
+    ''',
+    # 11: when the status last changed (drives archiving; older rows get
+    # created_at), lookups for closed requests and for media in use, and
+    # which media blobs have moved to cold storage
+    '''
+    ALTER TABLE requests ADD COLUMN status_changed_at TEXT;
+    UPDATE requests SET status_changed_at = created_at;
+    CREATE INDEX IF NOT EXISTS idx_requests_closed ON requests (status, status_changed_at);
+    CREATE INDEX IF NOT EXISTS idx_requests_media ON requests (media) WHERE media IS NOT NULL;
+    ALTER TABLE media_blobs ADD COLUMN cold INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS idx_media_blobs_cold ON media_blobs (cold, size);
+    ''',
+    # 12: optimistic concurrency: a version bumped by every change, the admin
+    # who claimed the request, and the status changes allowed (enforced by a
+    # trigger; a NULL status counts as waiting)
+    '''
+    ALTER TABLE requests ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE requests ADD COLUMN claimed_by INTEGER;
+    CREATE TABLE IF NOT EXISTS status_transitions (
+        from_status TEXT NOT NULL,
+        to_status TEXT NOT NULL,
+        PRIMARY KEY (from_status, to_status)
+    ) WITHOUT ROWID;
+    INSERT OR IGNORE INTO status_transitions (from_status, to_status) VALUES
+        ('waiting', 'accepted'), ('waiting', 'denied'), ('waiting', 'done'), ('waiting', 'cancelled'),
+        ('accepted', 'waiting'), ('accepted', 'done'), ('accepted', 'denied'), ('accepted', 'cancelled'),
+        ('denied', 'waiting'), ('denied', 'accepted'),
+        ('done', 'waiting');
+    CREATE TRIGGER IF NOT EXISTS trg_requests_status_transition BEFORE UPDATE OF status ON requests
+    WHEN OLD.status IS NOT NEW.status AND NOT EXISTS (
+        SELECT 1 FROM status_transitions
+        WHERE from_status = COALESCE(OLD.status, 'waiting') AND to_status = NEW.status
+    )
+    BEGIN
+        SELECT RAISE(ABORT, 'status transition not allowed');
+    END;
+    ''',
+]
+
+
+def get_schema_version():
+    with read_connection() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate():
+    with write_connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, len(MIGRATIONS) + 1):
+            # Each step and its version bump commit together or not at all.
+            conn.executescript(
+                "BEGIN;\n" + MIGRATIONS[target - 1] +
+                f"\nPRAGMA user_version = {target};\nCOMMIT;"
             )
-        ''')
+        return max(version, len(MIGRATIONS))
 
-        conn.commit()
+
+# --- Initialize All Tables ---
+def init_db():
+    version = migrate()
+    init_archive()
+    enable_incremental_vacuum()
+    get_admin_ids()  # warm the in-memory caches before handlers need them
+    get_task_catalog()
+    return version
 
 
 # --- Request Management ---
-def add_request(user_id, username, task_type, sub_type, comment, media=None):
-    with get_connection() as conn:
+def add_request(user_id, username, task_type, sub_type, comment, media=None, media_file_id=None, media_kind=None):
+    now = datetime.now().isoformat()
+    with write_connection() as conn:
         c = conn.cursor()
         c.execute('''
-            INSERT INTO requests (user_id, username, task_type, sub_type, comment, media, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (user_id, username, task_type, sub_type, comment, media, datetime.now().isoformat()))
-        conn.commit()
+            INSERT INTO requests (user_id, username, task_type, sub_type, comment, media, created_at,
+                                  media_file_id, media_kind, status_changed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, username, task_type, sub_type, comment, media, now, media_file_id, media_kind, now))
         return c.lastrowid
 
 
-def update_status(request_id, status):
-    with get_connection() as conn:
-        conn.execute("UPDATE requests SET status = ? WHERE id = ?", (status, request_id))
+# --- Optimistic Concurrency ---
+# Changes to a request are compare-and-set: one UPDATE whose WHERE carries
+# every precondition (the version the caller saw, who claimed it, the
+# statuses it may be in), so there is no read-then-write window and no lock
+# beyond SQLite's own. When it matches no row, the current row is read to
+# say why and UpdateConflict is raised. Every change bumps `version`;
+# setting the status a request already has changes nothing and returns
+# False.
+EDITABLE_STATUSES = ("waiting",)  # the owner can still edit the comment
 
 
-def update_permission(request_id, can_message):
-    with get_connection() as conn:
-        conn.execute("UPDATE requests SET can_message = ? WHERE id = ?", (can_message, request_id))
+class UpdateConflict(Exception):
+    # reason: "missing", "changed" (version moved on), "claimed" (by another
+    # admin), "locked" (status no longer allows the edit) or "transition".
+    def __init__(self, reason, status=None, claimed_by=None):
+        super().__init__(reason)
+        self.reason, self.status, self.claimed_by = reason, status, claimed_by
 
 
-def update_comment(request_id, new_comment):
-    with get_connection() as conn:
-        conn.execute("UPDATE requests SET comment = ? WHERE id = ?", (new_comment, request_id))
+def _compare_and_set(conn, request_id, assignments, values=None, expected_version=None, admin_id=None,
+                     statuses=None, new_status=None, bump=True):
+    params = {"id": request_id, "expected_version": expected_version, "admin_id": admin_id,
+              "new_status": new_status, **(values or {})}
+    where = ["id = :id"]
+    if expected_version is not None:
+        where.append("version = :expected_version")
+    if admin_id is not None:
+        where.append("(claimed_by IS NULL OR claimed_by = :admin_id)")
+    if statuses:
+        where.append(f"status IN ({', '.join(f':status{i}' for i in range(len(statuses)))})")
+        params.update({f"status{i}": status for i, status in enumerate(statuses)})
+    if new_status is not None:
+        where.append('''EXISTS (
+            SELECT 1 FROM status_transitions
+            WHERE from_status = COALESCE(requests.status, 'waiting') AND to_status = :new_status
+        )''')
+    if bump:
+        assignments += ", version = version + 1"
+    cursor = conn.execute(f"UPDATE requests SET {assignments} WHERE {' AND '.join(where)}", params)
+    if cursor.rowcount:
+        return True
+
+    row = conn.execute("SELECT status, version, claimed_by FROM requests WHERE id = ?", (request_id,)).fetchone()
+    if row is None:
+        raise UpdateConflict("missing")
+    status, version, claimed_by = row
+    if expected_version is not None and version != expected_version:
+        reason = "changed"
+    elif admin_id is not None and claimed_by not in (None, admin_id):
+        reason = "claimed"
+    elif statuses and status not in statuses:
+        reason = "locked"
+    elif new_status is not None and (status or "waiting") == new_status:
+        return False
+    else:
+        reason = "transition"
+    raise UpdateConflict(reason, status, claimed_by)
+
+
+# `notice`, if given, is queued for the request's owner in the same
+# transaction as the change (see Outbox below). update_status returns False
+# (and queues nothing) if the request already had that status.
+def update_status(request_id, status, notice=None, expected_version=None, admin_id=None):
+    with write_connection() as conn:
+        changed = _compare_and_set(
+            conn, request_id, "status = :new_status, status_changed_at = :now", {"now": datetime.now().isoformat()},
+            expected_version=expected_version, admin_id=admin_id, new_status=status
+        )
+        if changed and notice:
+            _enqueue_notice(conn, request_id, notice)
+    if changed:
+        _invalidate_request(request_id)
+    return changed
+
+
+def update_permission(request_id, can_message, notice=None, expected_version=None, admin_id=None):
+    with write_connection() as conn:
+        _compare_and_set(
+            conn, request_id, "can_message = :can_message", {"can_message": can_message},
+            expected_version=expected_version, admin_id=admin_id
+        )
+        if notice:
+            _enqueue_notice(conn, request_id, notice)
+    _invalidate_request(request_id)
+
+
+# Only while the request is still waiting for an admin.
+def update_comment(request_id, new_comment, expected_version=None):
+    with write_connection() as conn:
+        _compare_and_set(
+            conn, request_id, "comment = :comment", {"comment": new_comment},
+            expected_version=expected_version, statuses=EDITABLE_STATUSES
+        )
+    _invalidate_request(request_id)
+
+
+# Assigns the request to one admin; claiming your own claim again is a
+# no-op success. Status and permission changes by other admins then fail
+# with "claimed" until it is released. Claims don't bump the version, so
+# the claiming admin's view stays current.
+def claim_request(request_id, admin_id):
+    with write_connection() as conn:
+        _compare_and_set(conn, request_id, "claimed_by = :admin_id", admin_id=admin_id, bump=False)
+    _invalidate_request(request_id)
+
+
+def release_request(request_id, admin_id):
+    with write_connection() as conn:
+        _compare_and_set(conn, request_id, "claimed_by = NULL", admin_id=admin_id, bump=False)
+    _invalidate_request(request_id)
+
+
+# --- Request Cache ---
+# Single-request lookups (detail views, ownership checks, toggles) read
+# through a bounded LRU of full rows. Every write to a request invalidates
+# its entry once committed, and a fill that raced an invalidation is
+# dropped, so views never go stale. Per process: cluster workers run with
+# it off, as they can't see each other's writes.
+REQUEST_CACHE_SIZE = 4096
+
+
+class RequestCache:
+    def __init__(self, size):
+        self.size = size
+        self.hits = self.misses = 0
+        self._rows = OrderedDict()
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    # Returns (row or None, token); pass the token to put() after reading.
+    def get(self, request_id):
+        with self._lock:
+            row = self._rows.get(request_id)
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._rows.move_to_end(request_id)
+            return row, self._invalidations
+
+    def put(self, request_id, row, token):
+        with self._lock:
+            if token != self._invalidations or not self.size:
+                return  # a write landed while we were reading
+            self._rows[request_id] = row
+            if len(self._rows) > self.size:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, request_id):
+        with self._lock:
+            self._invalidations += 1
+            self._rows.pop(request_id, None)
+
+    def resize(self, size):
+        with self._lock:
+            self.size = size
+            while len(self._rows) > size:
+                self._rows.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._rows.clear()
+
+
+request_cache = RequestCache(REQUEST_CACHE_SIZE)
+
+
+def _invalidate_request(request_id):
+    get_pool().after_commit(lambda: request_cache.invalidate(request_id))
+
+
+# Lookups by id check the live table first and fall through to the archive,
+# so archived requests still open from old messages and links.
+def _live_or_archived(select, where):
+    return f"{select} FROM requests WHERE {where} UNION ALL {select} FROM archive.requests WHERE {where} LIMIT 1"
 
 
 def get_request_by_id(request_id):
-    with get_connection() as conn:
-        row = conn.execute("SELECT * FROM requests WHERE id = ?", (request_id,)).fetchone()
+    row, token = request_cache.get(request_id)
+    if row is not None:
         return row
+    with read_connection() as conn:
+        row = _fetch(
+            conn, Request, _live_or_archived(f"SELECT {REQUEST_FIELDS}", "id = :id"), {"id": request_id}
+        ).fetchone()
+    if row is not None:
+        request_cache.put(request_id, row, token)
+    return row
+
+
+def get_request_summary(request_id):
+    row = get_request_by_id(request_id)
+    if row is None:
+        return None
+    return RequestSummary(
+        row.id, row.user_id, row.task_type, row.status, _preview(row.comment), row.can_message,
+        row.claimed_by, row.version
+    )
+
+
+# Existence / ownership check: None if there is no such request.
+def get_request_status(request_id, user_id=None):
+    row = get_request_by_id(request_id)
+    if row is None or (user_id is not None and row.user_id != user_id):
+        return None
+    return row.status
 
 
 def get_all_requests():
-    with get_connection() as conn:
-        return conn.execute("SELECT * FROM requests ORDER BY id DESC").fetchall()
+    with read_connection() as conn:
+        return _fetch(conn, Request, f"{SELECT_REQUEST} ORDER BY id DESC").fetchall()
 
 
 def get_waiting_requests():
-    with get_connection() as conn:
-        return conn.execute("SELECT * FROM requests WHERE status = 'waiting' ORDER BY id DESC").fetchall()
+    with read_connection() as conn:
+        return _fetch(conn, Request, f"{SELECT_REQUEST} WHERE status = 'waiting' ORDER BY id DESC").fetchall()
 
 
 def get_user_requests(user_id):
-    with get_connection() as conn:
-        return conn.execute("SELECT * FROM requests WHERE user_id = ? ORDER BY id DESC", (user_id,)).fetchall()
+    with read_connection() as conn:
+        return _fetch(conn, Request, f"{SELECT_REQUEST} WHERE user_id = ? ORDER BY id DESC", (user_id,)).fetchall()
+
+
+# Keyset pagination for request listings: newest first, `before_id` for the
+# next (older) page, `after_id` for the previous (newer) one. Rows are
+# RequestSummary; the comment preview is cut in SQL so full comments never
+# reach Python. Returns (rows, has_prev, has_next).
+def get_requests_page(user_id=None, statuses=None, before_id=None, after_id=None, limit=PAGE_SIZE):
+    where, params = [], []
+    if user_id is not None:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if statuses:
+        where.append(f"status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    if after_id is not None:
+        where.append("id > ?")
+        params.append(after_id)
+    elif before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+
+    sql = f'''
+        SELECT id, user_id, task_type, status, {PREVIEW_SQL}, can_message, claimed_by, version
+        FROM requests
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY id {"ASC" if after_id is not None else "DESC"}
+        LIMIT ?
+    '''
+    with read_connection() as conn:
+        rows = _fetch(conn, RequestSummary, sql, (*params, limit + 1)).fetchall()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if after_id is not None:
+        return rows[::-1], more, True
+    return rows, before_id is not None, more
+
+
+# Ranked full-text search. Every word of `text` must match (any column,
+# case- and accent-insensitive). Rows are RequestSummary, with
+# a snippet of the matching comment as the preview; pages are by offset
+# since rank order has no stable cursor.
+#
+# Only the newest SEARCH_CANDIDATES matches are ranked: bm25 has to score
+# every candidate, so a common word would otherwise cost a full pass over
+# its matches. The cutoff query walks the index by rowid without scoring.
+# Older matches are still reachable, unranked and newest first, by passing
+# before_id. Returns (rows, has_prev, has_next, older): `older` is the
+# before_id for the next page of older matches, or None if there are none.
+def _match_query(text):
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+SEARCH_SELECT = f'''
+    SELECT r.id, r.user_id, r.task_type, r.status,
+           snippet(requests_fts, 0, '', '', '...', {PREVIEW_LEN // 4}),
+           r.can_message, r.claimed_by, r.version
+    FROM requests_fts JOIN requests r ON r.id = requests_fts.rowid
+'''
+
+
+def search_requests(text, offset=0, limit=PAGE_SIZE, before_id=None):
+    match = _match_query(text)
+    if not match:
+        return [], False, False, None
+    with read_connection() as conn:
+        if before_id is not None:
+            rows = _fetch(conn, RequestSummary, f'''
+                {SEARCH_SELECT}
+                WHERE requests_fts MATCH :match AND requests_fts.rowid < :before_id
+                ORDER BY requests_fts.rowid DESC
+                LIMIT :limit
+            ''', {"match": match, "before_id": before_id, "limit": limit + 1}).fetchall()
+            older = rows[limit - 1].id if len(rows) > limit else None
+            return rows[:limit], True, False, older
+
+        cutoff = conn.execute('''
+            SELECT rowid FROM requests_fts WHERE requests_fts MATCH ?
+            ORDER BY rowid DESC LIMIT 1 OFFSET ?
+        ''', (match, SEARCH_CANDIDATES - 1)).fetchone()
+        cutoff = cutoff[0] if cutoff else 0
+        rows = _fetch(conn, RequestSummary, f'''
+            {SEARCH_SELECT}
+            WHERE requests_fts MATCH :match AND requests_fts.rowid >= :cutoff
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        ''', {"match": match, "cutoff": cutoff, "limit": limit + 1, "offset": offset}).fetchall()
+        older = None
+        if cutoff and conn.execute(
+            "SELECT 1 FROM requests_fts WHERE requests_fts MATCH ? AND rowid < ? LIMIT 1", (match, cutoff)
+        ).fetchone():
+            older = cutoff
+    return rows[:limit], offset > 0, len(rows) > limit, older
 
 
 def get_user_from_request(req_id):
-    with get_connection() as conn:
-        row = conn.execute("SELECT user_id FROM requests WHERE id = ?", (req_id,)).fetchone()
-        return row[0] if row else None
+    row = get_request_by_id(req_id)
+    return row.user_id if row else None
+
+
+def set_request_media(request_id, media):
+    with write_connection() as conn:
+        conn.execute("UPDATE requests SET media = ? WHERE id = ?", (media, request_id))
+    _invalidate_request(request_id)
+
+
+# --- Media Blobs ---
+# (file_name, cold) or None; cold blobs live in media_cold/ (see media.py).
+def get_media_blob(sha256):
+    with read_connection() as conn:
+        return conn.execute("SELECT file_name, cold FROM media_blobs WHERE sha256 = ?", (sha256,)).fetchone()
+
+
+def add_media_blob(sha256, file_name, size):
+    with write_connection() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO media_blobs (sha256, file_name, size, created_at) VALUES (?, ?, ?, ?)",
+            (sha256, file_name, size, datetime.now().isoformat())
+        )
+
+
+# False if there is no such blob (uploads from before media_blobs have none).
+def set_media_cold(sha256, cold):
+    with write_connection() as conn:
+        return conn.execute("UPDATE media_blobs SET cold = ? WHERE sha256 = ?", (int(cold), sha256)).rowcount > 0
+
+
+# Bytes in the hot store (media/), which is what the quota limits.
+def get_media_usage():
+    with read_connection() as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM media_blobs WHERE cold = 0").fetchone()[0]
+
+
+# Whether any live request still points at the blob (uploads are
+# deduplicated, so archiving one request doesn't free its file).
+# Live requests only, unless `archived` (then archived ones count too).
+def is_media_referenced(file_name, archived=False):
+    sql = "SELECT 1 FROM requests WHERE media = :name"
+    if archived:
+        sql += " UNION ALL SELECT 1 FROM archive.requests WHERE media = :name"
+    with read_connection() as conn:
+        return conn.execute(f"{sql} LIMIT 1", {"name": file_name}).fetchone() is not None
+
+
+# Forgets a blob; returns its size if it was hot (counted in the quota), else 0.
+def delete_media_blob(sha256):
+    with write_connection() as conn:
+        row = conn.execute("SELECT size, cold FROM media_blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            return 0
+        conn.execute("DELETE FROM media_blobs WHERE sha256 = ?", (sha256,))
+        return 0 if row[1] else row[0]
+
+
+# --- Reports ---
+def get_request_stats(days=7):
+    with read_connection() as conn:
+        rows = conn.execute(
+            "SELECT kind, key, count FROM request_stats WHERE kind IN ('total', 'status', 'task_type')"
+        ).fetchall()
+        day_rows = conn.execute(
+            "SELECT key, count FROM request_stats WHERE kind = 'day' ORDER BY key DESC LIMIT ?", (days,)
+        ).fetchall()
+
+    stats = {"total": 0, "status": {}, "task_type": {}, "day": dict(day_rows)}
+    for kind, key, count in rows:
+        if kind == "total":
+            stats["total"] = count
+        elif count:
+            stats[kind][key] = count
+    return stats
+
+
+# Counts are all-time, so archived requests are counted too.
+def rebuild_request_stats():
+    all_requests = '''(SELECT status, task_type, created_at FROM requests
+                       UNION ALL SELECT status, task_type, created_at FROM archive.requests)'''
+    with write_connection() as conn:
+        conn.executescript("BEGIN;\n" + REBUILD_STATS_SQL.replace("FROM requests", f"FROM {all_requests}") + "\nCOMMIT;")
+
+
+# --- Subscribers ---
+def upsert_subscriber(user_id, username):
+    now = datetime.now().isoformat()
+    with write_connection() as conn:
+        conn.execute('''
+            INSERT INTO subscribers (user_id, username, first_seen, last_seen) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                username = excluded.username, last_seen = excluded.last_seen, blocked = 0
+        ''', (user_id, username, now, now))
+
+
+def mark_subscriber_blocked(user_id):
+    with write_connection() as conn:
+        conn.execute("UPDATE subscribers SET blocked = 1 WHERE user_id = ?", (user_id,))
+
+
+def get_subscriber_count():
+    with read_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM subscribers WHERE blocked = 0").fetchone()[0]
+
+
+def get_subscriber_batch(after_user_id, limit):
+    with read_connection() as conn:
+        rows = conn.execute(
+            "SELECT user_id FROM subscribers WHERE blocked = 0 AND user_id > ? ORDER BY user_id LIMIT ?",
+            (after_user_id, limit)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+
+# --- Broadcasts ---
+def create_broadcast(admin_id, chat_id, text, total):
+    with write_connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO broadcasts (admin_id, chat_id, text, total, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (admin_id, chat_id, text, total, datetime.now().isoformat()))
+        return c.lastrowid
+
+
+def set_broadcast_message(broadcast_id, message_id):
+    with write_connection() as conn:
+        conn.execute("UPDATE broadcasts SET message_id = ? WHERE id = ?", (message_id, broadcast_id))
+
+
+# Progress is saved after every batch; a restarted bot resumes after `cursor`.
+def checkpoint_broadcast(broadcast_id, cursor, sent, failed):
+    with write_connection() as conn:
+        conn.execute(
+            "UPDATE broadcasts SET cursor = ?, sent = ?, failed = ? WHERE id = ?",
+            (cursor, sent, failed, broadcast_id)
+        )
+
+
+def finish_broadcast(broadcast_id):
+    with write_connection() as conn:
+        conn.execute(
+            "UPDATE broadcasts SET status = 'done', finished_at = ? WHERE id = ?",
+            (datetime.now().isoformat(), broadcast_id)
+        )
+
+
+def get_running_broadcasts():
+    with read_connection() as conn:
+        return conn.execute('''
+            SELECT id, chat_id, message_id, text, cursor, total, sent, failed
+            FROM broadcasts WHERE status = 'running' ORDER BY id
+        ''').fetchall()
+
+
+# --- Bot Persistence ---
+# Storage for persistence.SQLitePersistence: pickled blobs per (kind, id) and
+# JSON conversation states per (handler name, key).
+def load_persistence_data(kind):
+    with read_connection() as conn:
+        return conn.execute("SELECT id, data FROM persistence_data WHERE kind = ?", (kind,)).fetchall()
+
+
+def load_conversations(name):
+    with read_connection() as conn:
+        return conn.execute(
+            "SELECT key, state FROM persistence_conversations WHERE name = ?", (name,)
+        ).fetchall()
+
+
+# One transaction per flush. `data` / `conversations` are lists of rows to
+# upsert, `dropped_data` / `dropped_conversations` lists of keys to delete.
+def save_persistence(data, dropped_data, conversations, dropped_conversations):
+    with write_connection() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO persistence_data (kind, id, data) VALUES (?, ?, ?)", data
+        )
+        conn.executemany("DELETE FROM persistence_data WHERE kind = ? AND id = ?", dropped_data)
+        conn.executemany(
+            "INSERT OR REPLACE INTO persistence_conversations (name, key, state) VALUES (?, ?, ?)",
+            conversations
+        )
+        conn.executemany(
+            "DELETE FROM persistence_conversations WHERE name = ? AND key = ?", dropped_conversations
+        )
+
+
+# --- Outbox ---
+# Rows are delivered in (next_attempt_at, id) order. A chat's rows never
+# become due before an earlier row of the same chat: new rows start no
+# earlier than the chat's latest retry time, and a retry defers the whole
+# chat. So a batch in that order is also in per-chat id order.
+def _enqueue_notice(conn, request_id, text):
+    conn.execute('''
+        INSERT INTO outbox (chat_id, text, next_attempt_at)
+        SELECT r.user_id, ?, MAX(?, COALESCE(
+            (SELECT MAX(o.next_attempt_at) FROM outbox o WHERE o.chat_id = r.user_id), ''))
+        FROM requests r WHERE r.id = ?
+    ''', (text, datetime.now().isoformat(), request_id))
+
+
+def get_due_outbox(limit):
+    with read_connection() as conn:
+        return conn.execute('''
+            SELECT id, chat_id, text, attempts FROM outbox
+            WHERE next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?
+        ''', (datetime.now().isoformat(), limit)).fetchall()
+
+
+def delete_outbox(ids):
+    with write_connection() as conn:
+        conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+
+def retry_outbox(message_id, chat_id, next_attempt_at):
+    with write_connection() as conn:
+        conn.execute("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (message_id,))
+        conn.execute(
+            "UPDATE outbox SET next_attempt_at = ? WHERE chat_id = ? AND next_attempt_at < ?",
+            (next_attempt_at, chat_id, next_attempt_at)
+        )
+
+
+# --- Archive ---
+# Requests closed for a while are moved out of the live table into
+# archive.requests (a separate file, attached to every connection), which
+# keeps the hot table, its indexes and the FTS index small. Lookups by id
+# fall through to it; listings and search cover live requests only.
+CLOSED_STATUSES = ("done", "denied", "cancelled")
+
+
+# Creates archive.requests and adds any columns requests has gained since.
+def init_archive():
+    with write_connection() as conn:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS archive.requests "
+            f"(id INTEGER PRIMARY KEY, {', '.join(REQUEST_COLUMNS[1:])}, archived_at TEXT)"
+        )
+        existing = {row[1] for row in conn.execute("PRAGMA archive.table_info(requests)")}
+        for column in REQUEST_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE archive.requests ADD COLUMN {column}")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS archive.idx_requests_media ON requests (media) WHERE media IS NOT NULL"
+        )
+
+
+# Databases created before auto_vacuum was set need one full VACUUM to
+# switch over; after that incremental_vacuum() returns free pages in steps.
+def enable_incremental_vacuum():
+    with write_connection() as conn:
+        for schema in ("main", "archive"):
+            if conn.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+                conn.execute(f"PRAGMA {schema}.auto_vacuum=INCREMENTAL")
+                conn.execute(f"VACUUM {schema}")
+
+
+# Moves up to `limit` requests closed before `cutoff`; returns how many moved
+# and the media file names they referenced. The copy commits before the delete, so a crash
+# in between leaves a row in both tables (copied again next time), never in
+# neither.
+def archive_requests(cutoff, limit):
+    placeholders = ", ".join("?" * len(CLOSED_STATUSES))
+    with write_connection() as conn:
+        # Pinned: with few distinct statuses ANALYZE stats make a LIMIT
+        # scan look cheaper, but old closed rows are a small slice.
+        rows = conn.execute(
+            f"SELECT id, media FROM requests INDEXED BY idx_requests_closed "
+            f"WHERE status IN ({placeholders}) AND status_changed_at < ? LIMIT ?",
+            (*CLOSED_STATUSES, cutoff, limit)
+        ).fetchall()
+        if not rows:
+            return 0, []
+        now = datetime.now().isoformat()
+        conn.executemany(
+            f"INSERT OR REPLACE INTO archive.requests ({REQUEST_FIELDS}, archived_at) "
+            f"SELECT {REQUEST_FIELDS}, ? FROM requests WHERE id = ?",
+            [(now, request_id) for request_id, _ in rows]
+        )
+        conn.commit()
+        conn.executemany("DELETE FROM requests WHERE id = ?", [(request_id,) for request_id, _ in rows])
+    return len(rows), [media for _, media in rows if media]
+
+
+# Frees up to `pages` pages from each file; returns the free pages left.
+def incremental_vacuum(pages):
+    remaining = 0
+    with write_connection() as conn:
+        for schema in ("main", "archive"):
+            conn.execute(f"PRAGMA {schema}.incremental_vacuum({int(pages)})").fetchall()
+            remaining += conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+    return remaining
+
+
+# --- Export ---
+EXPORT_BATCH = 1000
+
+
+# Yields every request matching the filters, live and archived, in id order.
+# Runs on a connection of its own (a long export must not hold a pooled
+# reader) and pulls rows in fetchmany batches, so memory stays flat however
+# many rows match. `until` is exclusive. NOT INDEXED keeps the live side in
+# id order so both sides merge without a sort.
+def iter_requests(statuses=None, task_type=None, since=None, until=None, batch=EXPORT_BATCH):
+    where, params = [], {}
+    if statuses:
+        where.append(f"status IN ({', '.join(f':status{i}' for i in range(len(statuses)))})")
+        params.update({f"status{i}": status for i, status in enumerate(statuses)})
+    if task_type:
+        where.append("task_type = :task_type")
+        params["task_type"] = task_type
+    if since:
+        where.append("created_at >= :since")
+        params["since"] = since
+    if until:
+        where.append("created_at < :until")
+        params["until"] = until
+    clause = f" WHERE {' AND '.join(where)}" if where else ""
+
+    conn = open_connection(get_pool().path)
+    try:
+        cursor = _fetch(conn, Request, f'''
+            SELECT {REQUEST_FIELDS} FROM requests NOT INDEXED{clause}
+            UNION ALL SELECT {REQUEST_FIELDS} FROM archive.requests{clause}
+            ORDER BY id
+        ''', params)
+        while rows := cursor.fetchmany(batch):
+            yield from rows
+    finally:
+        conn.close()
 
 
 # --- Admin Management ---
+# Every admin check goes through one in-memory frozenset: config.ADMIN_IDS,
+# MAIN_ADMIN_ID and the admins table, loaded once. add_admin / remove_admin
+# swap in a new set once committed, still holding the write lock.
+STATIC_ADMIN_IDS = frozenset(ADMIN_IDS) | {MAIN_ADMIN_ID}
+_admin_ids = None
+
+
+def get_admin_ids():
+    global _admin_ids
+    if _admin_ids is None:
+        _admin_ids = STATIC_ADMIN_IDS | frozenset(get_admins())
+    return _admin_ids
+
+
+# Re-read the table; other processes sharing tasks.db may have changed it.
+def reload_admin_ids():
+    global _admin_ids
+    _admin_ids = STATIC_ADMIN_IDS | frozenset(get_admins())
+    return _admin_ids
+
+
+def _set_admin_ids(admin_ids):
+    global _admin_ids
+    _admin_ids = admin_ids
+
+
+def is_admin(user_id: int):
+    return user_id in get_admin_ids()
+
+
+def is_main_admin(user_id: int):
+    return user_id == MAIN_ADMIN_ID
+
+
 def add_admin(admin_id: int):
-    with get_connection() as conn:
+    with write_connection() as conn:
+        current = get_admin_ids()
         conn.execute("INSERT OR IGNORE INTO admins (admin_id) VALUES (?)", (admin_id,))
+        get_pool().after_commit(lambda: _set_admin_ids(current | {admin_id}))
 
 
+# Admins listed in config.py stay admins; only the table row is removed.
 def remove_admin(admin_id: int):
-    with get_connection() as conn:
+    with write_connection() as conn:
+        current = get_admin_ids()
         conn.execute("DELETE FROM admins WHERE admin_id = ?", (admin_id,))
+        if admin_id not in STATIC_ADMIN_IDS:
+            get_pool().after_commit(lambda: _set_admin_ids(current - {admin_id}))
 
 
 def get_admins():
-    with get_connection() as conn:
+    with read_connection() as conn:
         rows = conn.execute("SELECT admin_id FROM admins").fetchall()
         return [r[0] for r in rows]
 
 
-def is_admin(user_id: int):
-    return user_id in get_admins()
+# --- Task List Management ---
+# Menus read the catalog from memory: (version, task names), loaded once.
+# Writes replace it once committed, still holding the write lock, and bump
+# the version, so anything derived from it (keyboards) can be cached per
+# version. reload_task_catalog re-reads the table, like reload_admin_ids.
+_task_catalog = None
+
+
+def _read_task_list(conn):
+    return tuple(r[0] for r in conn.execute("SELECT task_name FROM task_list ORDER BY id"))
+
+
+def _replace_task_catalog(names):
+    global _task_catalog
+    if _task_catalog is None or _task_catalog[1] != names:
+        _task_catalog = ((_task_catalog[0] + 1) if _task_catalog else 1, names)
+    return _task_catalog
+
+
+def _replace_task_catalog_on_commit(conn):
+    names = _read_task_list(conn)
+    get_pool().after_commit(lambda: _replace_task_catalog(names))
 
 
-# --- Task List Management ---
 def get_task_list():
-    with get_connection() as conn:
-        rows = conn.execute("SELECT task_name FROM task_list ORDER BY id").fetchall()
-        return [r[0] for r in rows]
+    with read_connection() as conn:
+        return list(_read_task_list(conn))
+
+
+def get_task_catalog():
+    if _task_catalog is None:
+        return reload_task_catalog()
+    return _task_catalog
+
+
+def reload_task_catalog():
+    with read_connection() as conn:
+        return _replace_task_catalog(_read_task_list(conn))
 
 
 def add_task(task_name: str):
-    with get_connection() as conn:
+    with write_connection() as conn:
         conn.execute("INSERT INTO task_list (task_name) VALUES (?)", (task_name,))
+        _replace_task_catalog_on_commit(conn)
 
 
 def remove_task(task_name: str):
-    with get_connection() as conn:
+    with write_connection() as conn:
         conn.execute("DELETE FROM task_list WHERE task_name = ?", (task_name,))
+        _replace_task_catalog_on_commit(conn)
+
 
 def set_task_list(task_names: list[str]):
-    with get_connection() as conn:
+    with write_connection() as conn:
         conn.execute("DELETE FROM task_list")
         conn.executemany("INSERT INTO task_list (task_name) VALUES (?)", [(t,) for t in task_names])
+        _replace_task_catalog_on_commit(conn)
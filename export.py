@@ -0,0 +1,93 @@
+# export.py
+# Bulk export of requests for admins: rows stream from db.iter_requests
+# straight into a gzip-compressed CSV or JSONL file, which is then sent as a
+# document.
+#
+# Admins ask for one with a single message:
+#   csv status=done,denied type=Software Task from=2024-01-01 to=2024-06-30
+# Every filter is optional; `to` is inclusive.
+
+import asyncio
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+from datetime import date, datetime, timedelta
+import db
+
+FORMATS = ("csv", "jsonl")
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024  # Bot API limit for documents
+FILTER_PATTERN = re.compile(r"(\w+)=(.*?)(?=\s+\w+=|$)")
+
+
+# --- Parsing ---
+def _parse_date(key, value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a date like 2024-01-31") from None
+
+
+# "csv status=done type=Other" -> ("csv", {"statuses": ("done",), "task_type": "Other"}).
+# Raises ValueError with a message for the admin.
+def parse_request(text):
+    fmt, _, rest = text.strip().partition(" ")
+    fmt, rest = fmt.lower(), rest.strip()
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if rest and not FILTER_PATTERN.match(rest):
+        raise ValueError(f"can't read filters: {rest}")
+
+    filters = {}
+    for key, value in FILTER_PATTERN.findall(rest):
+        value = value.strip()
+        if key == "status":
+            filters["statuses"] = tuple(s.strip() for s in value.split(",") if s.strip())
+        elif key == "type":
+            filters["task_type"] = value
+        elif key == "from":
+            filters["since"] = _parse_date(key, value).isoformat()
+        elif key == "to":
+            filters["until"] = (_parse_date(key, value) + timedelta(days=1)).isoformat()
+        else:
+            raise ValueError(f"unknown filter: {key} (use status, type, from, to)")
+    return fmt, filters
+
+
+# --- Writing ---
+def write_export(path, rows, fmt):
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(db.REQUEST_COLUMNS)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(row._asdict(), ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def _export(fmt, filters):
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}.gz")
+    os.close(fd)
+    try:
+        return path, write_export(path, db.iter_requests(**filters), fmt)
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+# Writes the export on a worker thread (not a DB thread: it has its own
+# connection and may run for a while). The caller deletes the file.
+async def export_requests(fmt, filters):
+    return await asyncio.get_running_loop().run_in_executor(None, _export, fmt, filters)
+
+
+def file_name(fmt):
+    return f"requests-{datetime.now():%Y%m%d-%H%M%S}.{fmt}.gz"
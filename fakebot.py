@@ -0,0 +1,169 @@
+# fakebot.py
+# A minimal local stand-in for the Telegram Bot API, for load tests. It
+# serves getUpdates from an in-memory queue, records everything the bot
+# sends, and answers the handful of methods the bot calls.
+
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+TOKEN = "123456:FAKE-TOKEN"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+
+# --- Update Builders ---
+_message_ids = itertools.count(1)
+
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+
+
+def message_update(update_id, user_id, text):
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": _user(user_id),
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def callback_update(update_id, user_id, data):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": next(_message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "menu",
+            },
+        },
+    }
+
+
+# --- Server ---
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default backlog of 5 stalls concurrent clients
+
+    def handle_error(self, request, client_address):
+        pass  # the bot hangs up on long polls when it stops
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.0):
+        self.latency = latency      # simulated Telegram round trip per call
+        self.sent = []              # (method, params) of everything the bot sent
+        self.calls = {}             # method -> count
+        self._updates = deque()
+        self._cond = threading.Condition()
+        self._server = _Server(("127.0.0.1", 0), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/bot"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def push_update(self, update):
+        with self._cond:
+            self._updates.append(update)
+            self._cond.notify_all()
+
+    def wait_for_sent(self, count, timeout=60):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while len(self.sent) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # --- Bot API methods ---
+    def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._updates and self._updates[0]["update_id"] < offset:
+                self._updates.popleft()
+            while not self._updates and time.monotonic() < deadline:
+                self._cond.wait(deadline - time.monotonic())
+            return list(itertools.islice(self._updates, limit))
+
+    def _message(self, params):
+        return {
+            "message_id": next(_message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    def call(self, method, params):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getUpdates":
+            return self._get_updates(params)
+        if self.latency:
+            time.sleep(self.latency)
+        if method == "getMe":
+            return BOT_USER
+        if method.startswith("send") or method in ("editMessageText", "copyMessage"):
+            with self._cond:
+                self.sent.append((method, params))
+                self._cond.notify_all()
+            return self._message(params)
+        return True  # answerCallbackQuery, setWebhook, deleteWebhook, ...
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def do_POST(self):
+                method = self.path.rsplit("/", 1)[-1]
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                content_type = self.headers.get("Content-Type", "")
+                params = {}
+                if "json" in content_type:
+                    params = json.loads(body or b"{}")
+                elif "urlencoded" in content_type:
+                    params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+                payload = json.dumps({"ok": True, "result": api.call(method, params)}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,116 @@
+# flood.py
+# Per-user flood control, run ahead of every conversation handler (group -1).
+# Each user has a token bucket per action class; an update that finds its
+# bucket empty is dropped before any handler, DB or API work. Admins are
+# never throttled. In multi-process mode each worker only sees its own
+# shard of users, so counts are per worker.
+
+import collections
+import time
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+from db import is_admin
+import metrics
+
+# action -> (burst, seconds per extra token)
+LIMITS = {
+    "command": (5, 10),     # /start and friends
+    "submit": (3, 60),      # submitting a request
+    "media": (5, 20),       # attachments (each one is downloaded)
+    "message": (10, 3),     # comments, messages to the admin
+    "button": (30, 0.5),    # every other button press
+}
+IDLE_TTL = 900  # forget a bucket after this long without updates (it'd be full again anyway)
+TOP_USERS = 10
+WARNING = "⏳ Too many requests, please slow down."
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "dropped", "warned")
+
+    def __init__(self, tokens, now):
+        self.tokens, self.updated, self.dropped, self.warned = tokens, now, 0, False
+
+
+# --- Buckets ---
+# Kept in least-recently-used order, so idle buckets expire from the front
+# in O(1) per update: memory is a few small objects per active user.
+_buckets = collections.OrderedDict()  # (user_id, action) -> _Bucket
+_dropped = collections.Counter()      # action -> updates dropped since start
+
+
+def classify(update):
+    if update.callback_query:
+        return "submit" if update.callback_query.data == "submit" else "button"
+    message = update.message
+    if message is None:
+        return None
+    if message.photo or message.document or message.voice:
+        return "media"
+    if message.text and message.text.startswith("/"):
+        return "command"
+    return "message"
+
+
+def _expire(now):
+    while _buckets:
+        bucket = next(iter(_buckets.values()))
+        if now - bucket.updated < IDLE_TTL:
+            break
+        _buckets.popitem(last=False)
+
+
+# Takes a token; returns None if the update may pass, else the empty bucket.
+def throttle(user_id, action, now=None):
+    now = time.monotonic() if now is None else now
+    burst, interval = LIMITS[action]
+    key = (user_id, action)
+    _expire(now)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = _Bucket(burst, now)
+    else:
+        _buckets.move_to_end(key)
+        bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated) / interval)
+        bucket.updated = now
+
+    if bucket.tokens >= 1:
+        bucket.tokens -= 1
+        bucket.warned = False
+        return None
+    bucket.dropped += 1
+    _dropped[action] += 1
+    metrics.THROTTLED.inc(action)
+    return bucket
+
+
+# (dropped per action since start, [(user_id, dropped)] of the users
+# throttled most among those active in the last IDLE_TTL seconds)
+def report():
+    per_user = collections.Counter()
+    for (user_id, _), bucket in _buckets.items():
+        if bucket.dropped:
+            per_user[user_id] += bucket.dropped
+    return dict(_dropped), per_user.most_common(TOP_USERS)
+
+
+# --- Handler ---
+async def check(update: Update, context):
+    user = update.effective_user
+    action = classify(update)
+    if user is None or action is None or is_admin(user.id):
+        return
+    bucket = throttle(user.id, action)
+    if bucket is None:
+        return
+    if not bucket.warned:  # one notice per burst; the rest are dropped silently
+        bucket.warned = True
+        if update.callback_query:
+            await update.callback_query.answer(WARNING)
+        else:
+            await update.message.reply_text(WARNING)
+    raise ApplicationHandlerStop
+
+
+def get_flood_handler():
+    return TypeHandler(Update, check)
@@ -0,0 +1,251 @@
+# loadtest.py
+# Replays full conversations against the real handlers, with the Bot API
+# served by fakebot.py in a separate process. Every simulated user walks the
+# new-request flow (start -> type -> comment -> skip media -> submit) and
+# then pages through their history; admins list, page, open and re-status
+# requests and run a text search. Updates go straight into the
+# application's update_queue, so no polling overhead is measured.
+#
+# Usage: python loadtest.py [--users 2000] [--admins 20] [--out loadtest.json]
+#                           [--compare previous.json]
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import warnings
+
+from telegram import Update
+import db
+from config import CONCURRENT_UPDATES
+from fakebot import FakeBotAPI, TOKEN, message_update, callback_update
+from updates import PerUserUpdateProcessor
+
+ADMIN_BASE_ID = 9_000_000_000  # simulated admins get ids above this
+SEED_REQUESTS = 10_000
+COMMENTS = [
+    "need help with my java assignment", "python project due next week",
+    "slides for the marketing presentation", "physics lab report",
+    "database homework, normalisation questions", "history essay, 2000 words",
+]
+
+
+# --- Stub Bot API process ---
+def _serve_api(conn, latency):
+    api = FakeBotAPI(latency=latency).start()
+    conn.send(api.base_url)
+    conn.recv()  # stop
+    conn.send(api.calls)
+    api.stop()
+
+
+# --- Timing ---
+# The real per-user processor, timing each update and signalling its sender.
+class TimedProcessor(PerUserUpdateProcessor):
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self.latencies = {}  # step label -> [ms]
+        self.waiters = {}    # update_id -> (label, future)
+
+    async def do_process_update(self, update, coroutine):
+        start = time.perf_counter()
+        try:
+            await super().do_process_update(update, coroutine)
+        finally:
+            label, future = self.waiters.pop(update.update_id)
+            self.latencies.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+            future.set_result(None)
+
+
+class Driver:
+    def __init__(self, app, processor, think):
+        self.app = app
+        self.processor = processor
+        self.think = think
+        self._update_ids = iter(range(1, 1 << 62))
+
+    async def send(self, role, user_id, kind, data, label=None):
+        update_id = next(self._update_ids)
+        raw = message_update(update_id, user_id, data) if kind == "m" else callback_update(update_id, user_id, data)
+        future = asyncio.get_running_loop().create_future()
+        self.processor.waiters[update_id] = (f"{role}:{label or data}", future)
+        await self.app.update_queue.put(Update.de_json(raw, self.app.bot))
+        await future
+        if self.think:
+            await asyncio.sleep(random.uniform(0, self.think))
+
+
+# --- Scenarios ---
+async def user_session(driver, user_id):
+    await driver.send("user", user_id, "m", "/start")
+    await driver.send("user", user_id, "c", "new_request")
+    await driver.send("user", user_id, "c", random.choice(["Software Task", "Write Paper", "Other"]), "task_type")
+    await driver.send("user", user_id, "m", random.choice(COMMENTS), "comment")
+    await driver.send("user", user_id, "m", "skip")
+    await driver.send("user", user_id, "c", "submit")
+    await driver.send("user", user_id, "c", "check_request")
+    await driver.send("user", user_id, "c", "history")
+
+
+async def admin_session(driver, admin_id, rounds):
+    for _ in range(rounds):
+        await driver.send("admin", admin_id, "m", "/admin")
+        await driver.send("admin", admin_id, "c", "view_all")
+        await driver.send("admin", admin_id, "c", f"page:next:{random.randint(20, SEED_REQUESTS)}", "page")
+        await driver.send("admin", admin_id, "m", str(random.randint(1, SEED_REQUESTS)), "open_request")
+        await driver.send("admin", admin_id, "c", "change_status")
+        await driver.send("admin", admin_id, "c", random.choice(["accepted", "denied", "done"]), "set_status")
+        await driver.send("admin", admin_id, "m", "/admin")
+        await driver.send("admin", admin_id, "c", "search_text")
+        await driver.send("admin", admin_id, "m", random.choice(COMMENTS).split(",")[0], "search")
+
+
+# --- Reporting ---
+def _percentiles(samples):
+    samples = sorted(samples)
+
+    def pct(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))], 2)
+    return {"count": len(samples), "p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": round(samples[-1], 2)}
+
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(result, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline.get('revision')}):")
+    for key in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"]["all"][key], result["latency_ms"]["all"][key]
+        print(f"  {key:<20} {old:>9.2f} -> {new:>9.2f} ms ({(new - old) / old * 100 if old else 0:+.0f}%)")
+    for key in ("updates_per_sec", "db_ops_per_sec"):
+        old, new = baseline[key], result[key]
+        print(f"  {key:<20} {old:>9,.0f} -> {new:>9,.0f} ({(new - old) / old * 100 if old else 0:+.0f}%)")
+
+
+# --- Run ---
+async def _run(args, base_url):
+    from run import build_app
+
+    processor = TimedProcessor(CONCURRENT_UPDATES)
+    app = build_app(TOKEN, base_url, processor=processor)
+    driver = Driver(app, processor, args.think)
+
+    statements = [0]
+
+    def count_statement(sql):
+        if not sql.startswith("--"):  # skip statements run by triggers
+            statements[0] += 1
+
+    async with app:
+        await app.start()
+        await app.post_init(app)
+        rss_before = _rss_mb()
+        db.get_pool().set_trace_callback(count_statement)
+        start = time.perf_counter()
+
+        sessions = [user_session(driver, 100_000 + i) for i in range(args.users)]
+        sessions += [admin_session(driver, ADMIN_BASE_ID + i, args.admin_rounds) for i in range(args.admins)]
+        random.shuffle(sessions)
+        await asyncio.gather(*sessions)
+
+        elapsed = time.perf_counter() - start
+        db.get_pool().set_trace_callback(None)
+        rss_after = _rss_mb()
+        await app.post_stop(app)
+        await app.stop()
+
+    latencies = processor.latencies
+    every = [ms for samples in latencies.values() for ms in samples]
+    return {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "users": args.users, "admins": args.admins, "admin_rounds": args.admin_rounds,
+            "think_s": args.think, "api_latency_ms": args.latency_ms,
+            "concurrent_updates": CONCURRENT_UPDATES, "cpus": os.cpu_count(),
+        },
+        "elapsed_s": round(elapsed, 2),
+        "updates": len(every),
+        "updates_per_sec": round(len(every) / elapsed, 1),
+        "db_ops_per_sec": round(statements[0] / elapsed, 1),
+        "memory_mb": {
+            "rss_before": round(rss_before, 1),
+            "rss_after": round(rss_after, 1),
+            "peak_rss": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "latency_ms": {"all": _percentiles(every), **{k: _percentiles(v) for k, v in sorted(latencies.items())}},
+    }
+
+
+def _seed(admins):
+    rng = random.Random(1)
+    with db.write_connection() as conn:
+        conn.executemany(
+            "INSERT INTO requests (user_id, username, task_type, comment, status, created_at) VALUES (?, ?, ?, ?, 'waiting', ?)",
+            [(i % 500, f"seed{i % 500}", "Other", rng.choice(COMMENTS), "2024-01-01") for i in range(SEED_REQUESTS)]
+        )
+    for i in range(admins):
+        db.add_admin(ADMIN_BASE_ID + i)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000, help="simulated users, all active at once")
+    parser.add_argument("--admins", type=int, default=20)
+    parser.add_argument("--admin-rounds", type=int, default=5, help="admin menu walks per admin")
+    parser.add_argument("--think", type=float, default=0.5, help="max seconds a user waits between steps")
+    parser.add_argument("--latency-ms", type=float, default=20, help="simulated Bot API round trip")
+    parser.add_argument("--out", default="loadtest.json")
+    parser.add_argument("--compare", help="previous results file to diff against")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")  # PTB's per_message notes on the conversation handlers
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve_api, args=(child, args.latency_ms / 1000), daemon=True)
+    server.start()
+    base_url = parent.recv()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, "loadtest.db"))
+        db.init_db()
+        _seed(args.admins)
+        result = asyncio.run(_run(args, base_url))
+        db.close_pool()
+
+    parent.send("stop")
+    result["bot_api_calls"] = parent.recv()
+    server.join()
+
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    overall = result["latency_ms"]["all"]
+    print(f"{result['updates']:,} updates in {result['elapsed_s']}s "
+          f"({result['updates_per_sec']:,.0f}/s, {result['db_ops_per_sec']:,.0f} DB ops/s)")
+    print(f"handler latency ms: p50 {overall['p50']}  p95 {overall['p95']}  p99 {overall['p99']}")
+    print(f"peak RSS {result['memory_mb']['peak_rss']} MB; results written to {args.out}")
+    if args.compare:
+        _compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# media.py
+
+import asyncio
+import collections
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+from uuid import uuid4
+from telegram.error import BadRequest
+import db
+from async_db import set_request_media
+from background import BackgroundTasks
+
+logger = logging.getLogger(__name__)
+
+MEDIA_DIR = "media"
+COLD_MEDIA_DIR = "media_cold"         # blobs only archived requests use; can be slower/cheaper storage
+CONCURRENCY = 4                       # downloads in flight
+MAX_MEDIA_BYTES = 20 * 1024 * 1024    # Telegram bots can't download more anyway
+MEDIA_QUOTA_BYTES = 5 * 1024 ** 3     # total size of media/
+JOB_TTL = 3600                        # forget finished, never-submitted jobs after this
+STOP_GRACE = 30                       # seconds stop() lets downloads in flight finish
+
+os.makedirs(MEDIA_DIR, exist_ok=True)
+os.makedirs(COLD_MEDIA_DIR, exist_ok=True)
+
+
+class MediaRejected(Exception):
+    pass
+
+
+# --- Content-Addressed Store ---
+# Files are stored once as media/<sha256><ext>; the same upload sent again
+# maps to the existing blob. Disk usage of media/ is tracked in memory
+# (loaded once from media_blobs); it grows when a blob is written or
+# promoted back from cold storage and shrinks when one moves to cold or is
+# released. Each stored upload holds a claim on its blob until it is linked
+# to a request or discarded; a blob with no claims and no request is deleted.
+_store_lock = threading.Lock()
+_usage = None
+_claims = collections.Counter()  # file name -> uploads not yet linked or discarded
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _store(tmp_path, ext):
+    global _usage
+    try:
+        size = os.path.getsize(tmp_path)
+        if size > MAX_MEDIA_BYTES:
+            raise MediaRejected(f"file is {size} bytes, limit is {MAX_MEDIA_BYTES}")
+        digest = _hash_file(tmp_path)
+
+        with _store_lock:
+            blob = db.get_media_blob(digest)
+            existing, cold = blob if blob else (None, False)
+            if existing and not cold and os.path.exists(os.path.join(MEDIA_DIR, existing)):
+                _claims[existing] += 1
+                return existing
+
+            if _usage is None:
+                _usage = db.get_media_usage()
+            if (not existing or cold) and _usage + size > MEDIA_QUOTA_BYTES:
+                raise MediaRejected("media quota exceeded")
+
+            file_name = existing or f"{digest}{ext.lower()}"
+            os.replace(tmp_path, os.path.join(MEDIA_DIR, file_name))
+            if not existing:
+                db.add_media_blob(digest, file_name, size)
+                _usage += size
+            elif cold:
+                # Uploaded again: a live request needs it, so it's hot again.
+                db.set_media_cold(digest, False)
+                _usage += size
+                cold_path = os.path.join(COLD_MEDIA_DIR, file_name)
+                if os.path.exists(cold_path):
+                    os.remove(cold_path)
+            _claims[file_name] += 1
+            return file_name
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Moves blobs no live request uses any more to COLD_MEDIA_DIR (called by
+# archive.py with the media of archived requests). Returns how many moved.
+def move_to_cold(file_names):
+    global _usage
+    moved = 0
+    for file_name in set(file_names):
+        with _store_lock:
+            hot_path = os.path.join(MEDIA_DIR, file_name)
+            if db.is_media_referenced(file_name) or not os.path.exists(hot_path):
+                continue
+            size = os.path.getsize(hot_path)
+            shutil.move(hot_path, os.path.join(COLD_MEDIA_DIR, file_name))
+            # Only blobs in media_blobs count towards the quota.
+            if db.set_media_cold(os.path.splitext(file_name)[0], True) and _usage is not None:
+                _usage -= size
+            moved += 1
+    return moved
+
+
+# Drops an upload's claim (it was linked to its request, or abandoned) and
+# deletes the blob once no other upload and no request holds it.
+def _release(file_name):
+    global _usage
+    with _store_lock:
+        _claims[file_name] -= 1
+        if _claims[file_name] > 0:
+            return
+        del _claims[file_name]
+        if db.is_media_referenced(file_name, archived=True):
+            return
+        size = db.delete_media_blob(os.path.splitext(file_name)[0])
+        if _usage is not None:
+            _usage -= size
+        for directory in (MEDIA_DIR, COLD_MEDIA_DIR):
+            path = os.path.join(directory, file_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def blob_path(file_name):
+    for directory in (MEDIA_DIR, COLD_MEDIA_DIR):
+        path = os.path.join(directory, file_name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# --- Background Pipeline ---
+# receive_media hands the file off with submit() and moves on; the download
+# runs here. Once it has landed and the request exists (attach()), the blob
+# name is written to requests.media. stop() lets downloads in flight
+# finish (up to STOP_GRACE) and cancels the rest.
+_semaphore = asyncio.Semaphore(CONCURRENCY)
+_jobs = {}
+_tasks = BackgroundTasks()
+
+
+def _release_stored(stored):
+    if not stored.cancelled() and stored.exception() is None:
+        _release(stored.result())
+
+
+async def _download(file, ext):
+    tg_file = await file.get_file()
+    tmp_path = os.path.join(MEDIA_DIR, f".{uuid4().hex}.part")
+    try:
+        await tg_file.download_to_drive(tmp_path)
+    except BaseException:  # failed or cancelled: don't leave the .part behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    stored = asyncio.get_running_loop().run_in_executor(None, _store, tmp_path, ext)
+    try:
+        return await asyncio.shield(stored)
+    except asyncio.CancelledError:
+        # _store runs to the end on its thread; give back what it claims.
+        stored.add_done_callback(_release_stored)
+        raise
+
+
+async def _run(job_id, file, ext):
+    job = _jobs[job_id]
+    try:
+        async with _semaphore:
+            job["file_name"] = await _download(file, ext)
+    except MediaRejected as e:
+        logger.warning("media job %s rejected: %s", job_id, e)
+    except Exception:
+        logger.exception("media job %s failed", job_id)
+    job["done"] = True
+    await _link(job_id)
+
+
+async def _link(job_id):
+    job = _jobs.get(job_id)
+    if not job or not job["done"] or job["request_id"] is None:
+        return
+    del _jobs[job_id]
+    if job["file_name"]:
+        try:
+            await set_request_media(job["request_id"], job["file_name"])
+        finally:
+            await asyncio.get_running_loop().run_in_executor(None, _release, job["file_name"])
+
+
+def _expire_jobs():
+    cutoff = time.monotonic() - JOB_TTL
+    for job_id in [j for j, job in _jobs.items() if job["done"] and job["created"] < cutoff]:
+        discard(job_id)
+
+
+def submit(file, ext):
+    _expire_jobs()
+    job_id = uuid4().hex
+    job = _jobs[job_id] = {"created": time.monotonic(), "done": False, "file_name": None, "request_id": None}
+    job["task"] = _tasks.spawn(_run(job_id, file, ext))
+    return job_id
+
+
+async def attach(job_id, request_id):
+    job = _jobs.get(job_id)
+    if job:
+        job["request_id"] = request_id
+        await _link(job_id)
+
+
+# The upload was abandoned: stop the download, or free the blob it stored.
+def discard(job_id):
+    job = _jobs.pop(job_id, None)
+    if not job:
+        return
+    job["task"].cancel()
+    if job["file_name"]:
+        asyncio.get_running_loop().run_in_executor(None, _release, job["file_name"])
+
+
+async def stop():
+    await _tasks.stop(STOP_GRACE)
+    # Jobs don't survive a restart: uploads never attached would be orphaned.
+    loop = asyncio.get_running_loop()
+    for job in list(_jobs.values()):
+        if job["file_name"]:
+            await loop.run_in_executor(None, _release, job["file_name"])
+    _jobs.clear()
+
+
+# --- Sending Attachments ---
+# Re-sending by file_id uploads nothing; the local copy is only used when
+# Telegram rejects the id (e.g. the file expired or the bot token changed).
+_SENDERS = {"photo": "reply_photo", "document": "reply_document", "voice": "reply_voice"}
+
+
+async def send_attachment(message, file_id, kind, file_name):
+    if file_id and kind in _SENDERS:
+        try:
+            await getattr(message, _SENDERS[kind])(file_id)
+            return True
+        except BadRequest:
+            logger.warning("file_id for %s rejected, falling back to local copy", file_name)
+
+    path = blob_path(file_name) if file_name else None
+    if not path:
+        return False
+    with open(path, "rb") as f:
+        await message.reply_document(f, filename=file_name)
+    return True
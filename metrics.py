@@ -0,0 +1,282 @@
+# metrics.py
+# In-process metrics in Prometheus text format, served on a local port:
+#   handler latency per callback, timing per db.py call, Telegram API calls
+#   and errors per method, and event-loop lag.
+# GET /metrics returns everything; GET /profile?seconds=N (only when
+# PROFILER_ENABLED) samples every thread's stack for N seconds and returns
+# the hottest stacks.
+
+import asyncio
+import collections
+import functools
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from telegram.ext import ApplicationHandlerStop, ConversationHandler
+from telegram.request import HTTPXRequest
+import db
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LAG_INTERVAL = 0.5           # seconds between event-loop lag probes
+PROFILE_INTERVAL = 0.005     # seconds between profiler samples
+PROFILE_MAX_SECONDS = 60
+PROFILE_TOP = 25
+
+
+# --- Registry ---
+# Each metric holds one series per label value; observe/inc are called from
+# the event loop and from the DB threads, so updates take a lock.
+class Counter:
+    def __init__(self, name, help_text, label):
+        self.name, self.help, self.label = name, help_text, label
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for value, count in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{self.label}="{value}"}} {count:g}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label=None, buckets=BUCKETS):
+        self.name, self.help, self.label, self.buckets = name, help_text, label, buckets
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, label_value=""):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for value, series in sorted(self._series.items()):
+                labels = f'{self.label}="{value}",' if self.label else ""
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{labels}le="{bound:g}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{labels}le="+Inf"}} {series[-1]}')
+                suffix = f"{{{labels.rstrip(',')}}}" if labels else ""
+                lines.append(f"{self.name}_sum{suffix} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+# Reads a value kept elsewhere (e.g. db.request_cache) at scrape time.
+class Sampled:
+    def __init__(self, name, help_text, kind, read):
+        self.name, self.help, self.kind, self.read = name, help_text, kind, read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {self.read():g}"]
+
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Handler callback latency.", "handler")
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler callbacks that raised.", "handler")
+DB_SECONDS = Histogram("bot_db_seconds", "Time spent in each db.py function (on the DB thread).", "function")
+DB_WAIT_SECONDS = Histogram("bot_db_queue_seconds", "Time DB calls waited for a free DB thread.")
+DB_ERRORS = Counter("bot_db_errors_total", "db.py calls that raised.", "function")
+API_SECONDS = Histogram("bot_telegram_request_seconds", "Bot API request latency.", "method")
+API_ERRORS = Counter("bot_telegram_errors_total", "Bot API requests that failed (network or HTTP >= 400).", "method")
+LOOP_LAG_SECONDS = Histogram("bot_event_loop_lag_seconds", "How late the event loop ran a timer.")
+REQUEST_CACHE_HITS = Sampled(
+    "bot_request_cache_hits_total", "Request lookups served from the cache.", "counter", lambda: db.request_cache.hits
+)
+REQUEST_CACHE_MISSES = Sampled(
+    "bot_request_cache_misses_total", "Request lookups that went to SQLite.", "counter", lambda: db.request_cache.misses
+)
+THROTTLED = Counter("bot_throttled_updates_total", "Updates dropped by flood control.", "action")
+GROUP_COMMIT_SIZE = Histogram(
+    "bot_db_group_commit_size", "Writes committed per group-commit transaction.",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+
+METRICS = [
+    HANDLER_SECONDS, HANDLER_ERRORS, DB_SECONDS, DB_WAIT_SECONDS, DB_ERRORS,
+    API_SECONDS, API_ERRORS, LOOP_LAG_SECONDS, GROUP_COMMIT_SIZE, THROTTLED,
+    REQUEST_CACHE_HITS, REQUEST_CACHE_MISSES,
+]
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# --- Handlers ---
+def _timed_callback(callback):
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        start = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except ApplicationHandlerStop:
+            raise
+        except Exception:
+            HANDLER_ERRORS.inc(callback.__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, callback.__name__)
+    return wrapper
+
+
+# Wraps every callback of a ConversationHandler (entry points, states,
+# fallbacks) in place and returns it.
+def instrument(conversation):
+    groups = [conversation.entry_points, conversation.fallbacks, *conversation.states.values()]
+    for handlers in groups:
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                instrument(handler)
+            else:
+                handler.callback = _timed_callback(handler.callback)
+    return conversation
+
+
+# --- DB Calls ---
+# Used by async_db._in_db_thread: `submitted` is when the call was queued
+# for a DB thread.
+def timed_db_call(fn, submitted):
+    started = time.perf_counter()
+    DB_WAIT_SECONDS.observe(started - submitted)
+    try:
+        return fn()
+    except Exception:
+        DB_ERRORS.inc(fn.func.__name__)
+        raise
+    finally:
+        DB_SECONDS.observe(time.perf_counter() - started, fn.func.__name__)
+
+
+# --- Telegram API ---
+class MetricsRequest(HTTPXRequest):
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            status, payload = await super().do_request(url, method, request_data, **kwargs)
+        except Exception:
+            API_ERRORS.inc(api_method)
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - start, api_method)
+        if status >= 400:
+            API_ERRORS.inc(api_method)
+        return status, payload
+
+
+# --- Event Loop Lag ---
+async def _watch_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+
+
+# --- Sampling Profiler ---
+# Samples run on their own thread, so a blocked event loop still shows up.
+_profile_lock = threading.Lock()
+
+
+def profile(seconds):
+    stacks = collections.Counter()
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    samples = 0
+    deadline = time.monotonic() + min(seconds, PROFILE_MAX_SECONDS)
+    with _profile_lock:
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stacks[f"{names.get(ident, ident)};{';'.join(reversed(frames))}"] += 1
+            samples += 1
+            time.sleep(PROFILE_INTERVAL)
+
+    lines = [f"# {samples} samples over {seconds}s; count  thread;outermost;...;innermost frame"]
+    lines += [f"{count:>6}  {stack}" for stack, count in stacks.most_common(PROFILE_TOP)]
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP Endpoint ---
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+def _handler_class(profiler_enabled):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/metrics":
+                self._reply(200, render(), "text/plain; version=0.0.4")
+            elif url.path == "/profile" and profiler_enabled:
+                seconds = float(parse_qs(url.query).get("seconds", ["10"])[0])
+                self._reply(200, profile(seconds), "text/plain")
+            else:
+                self._reply(404, "not found\n", "text/plain")
+
+        def _reply(self, status, body, content_type):
+            body = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+_lag_task = None
+_server = None
+
+
+# Starts the lag probe on the running loop and the endpoint on its own
+# thread. Safe to call more than once; port 0 disables the endpoint.
+def start(port, host="127.0.0.1", profiler_enabled=False):
+    global _lag_task, _server
+    if _lag_task is not None:
+        return
+    _lag_task = asyncio.get_running_loop().create_task(_watch_loop_lag())
+    if port:
+        _server = _Server((host, port), _handler_class(profiler_enabled))
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+
+
+def stop():
+    global _lag_task, _server
+    if _lag_task is not None:
+        _lag_task.cancel()
+        _lag_task = None
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
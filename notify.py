@@ -0,0 +1,66 @@
+# notify.py
+
+import asyncio
+import logging
+from telegram.error import RetryAfter, TelegramError
+from broadcast import retry_seconds
+from db import get_admin_ids
+
+logger = logging.getLogger(__name__)
+
+DIGEST_WINDOW = 3      # seconds to collect follow-ups on one request
+MAX_MESSAGE_LEN = 4096
+
+
+# --- Per-Admin Delivery ---
+# Each admin is sent to independently: a blocked or slow admin chat is
+# logged and never affects the others or the user's confirmation.
+async def _send(bot, admin_id, text):
+    for _ in range(2):
+        try:
+            await bot.send_message(admin_id, text)
+            return True
+        except RetryAfter as e:
+            await asyncio.sleep(retry_seconds(e.retry_after))
+        except TelegramError as e:
+            logger.warning("could not notify admin %s: %s", admin_id, e)
+            return False
+    return False
+
+
+async def send_to_admins(bot, text):
+    results = await asyncio.gather(
+        *(_send(bot, admin_id, text) for admin_id in get_admin_ids()),
+        return_exceptions=True
+    )
+    return sum(r is True for r in results)
+
+
+# --- Digest ---
+# Messages about the same request that arrive within DIGEST_WINDOW of the
+# first one go out as a single message.
+_pending = {}  # (request id, user id) -> [sender, [messages]]
+
+
+def _digest_text(req_id, sender, messages):
+    if len(messages) == 1:
+        text = f"📨 Message from @{sender} (Request #{req_id}):\n{messages[0]}"
+    else:
+        body = "\n".join(f"• {m}" for m in messages)
+        text = f"📨 {len(messages)} messages from @{sender} (Request #{req_id}):\n{body}"
+    return text[:MAX_MESSAGE_LEN]
+
+
+async def _flush(bot, key):
+    await asyncio.sleep(DIGEST_WINDOW)
+    sender, messages = _pending.pop(key)
+    await send_to_admins(bot, _digest_text(key[0], sender, messages))
+
+
+def notify_admins(application, req_id, user_id, sender, text):
+    key = (req_id, user_id)
+    if key in _pending:
+        _pending[key][1].append(text)
+        return
+    _pending[key] = [sender, [text]]
+    application.create_task(_flush(application.bot, key))
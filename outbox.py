@@ -0,0 +1,114 @@
+# outbox.py
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+from async_db import get_due_outbox, delete_outbox, retry_outbox
+from background import BackgroundTasks
+from broadcast import limiter, retry_seconds
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+POLL_INTERVAL = 1      # seconds between outbox checks when idle
+MAX_ATTEMPTS = 5
+MAX_BACKOFF = 300      # seconds
+
+STATUS_NOTICES = {
+    "accepted": "✅ Your request #{id} has been accepted.",
+    "denied": "❌ Your request #{id} has been denied.",
+    "waiting": "⏳ Your request #{id} is waiting for review again.",
+    "done": "🎉 Your request #{id} is done.",
+}
+
+
+def status_notice(request_id, status):
+    text = STATUS_NOTICES.get(status, "🔁 Your request #{id} is now: {status}.")
+    return text.format(id=request_id, status=status)
+
+
+def permission_notice(request_id, can_message):
+    if can_message:
+        return f"💬 You can now message the admin about request #{request_id}."
+    return f"🔒 Messaging the admin about request #{request_id} has been turned off."
+
+
+# --- Dispatcher ---
+# Notifications are written to the outbox table in the same transaction as
+# the change they describe, so admin actions never wait on Telegram and
+# nothing is lost across restarts. This task drains the table: chats are
+# sent to concurrently, each chat's messages strictly in order. A failed
+# message defers its whole chat with exponential backoff.
+_wakeup = asyncio.Event()
+
+
+def wake():
+    _wakeup.set()
+
+
+async def _send_chat(bot, chat_id, messages):
+    delivered = []
+    for message_id, _, text, attempts in messages:
+        await limiter.wait()
+        try:
+            await bot.send_message(chat_id, text)
+            delivered.append(message_id)
+            continue
+        except RetryAfter as e:
+            delay = retry_seconds(e.retry_after)
+            limiter.pause(delay)
+        except (Forbidden, BadRequest) as e:
+            # Permanent: the user blocked the bot or the chat is gone.
+            logger.warning("dropping outbox message %s to %s: %s", message_id, chat_id, e)
+            delivered.append(message_id)
+            continue
+        except TelegramError as e:
+            logger.warning("outbox message %s to %s failed: %s", message_id, chat_id, e)
+            delay = min(2 ** attempts, MAX_BACKOFF)
+
+        if attempts + 1 >= MAX_ATTEMPTS:
+            logger.error("giving up on outbox message %s to %s", message_id, chat_id)
+            delivered.append(message_id)
+            continue
+        next_attempt = (datetime.now() + timedelta(seconds=delay)).isoformat()
+        await retry_outbox(message_id, chat_id, next_attempt)
+        break
+    return delivered
+
+
+async def drain(bot):
+    batch = await get_due_outbox(BATCH_SIZE)
+    chats = {}
+    for row in batch:
+        chats.setdefault(row[1], []).append(row)
+    results = await asyncio.gather(*(_send_chat(bot, chat_id, rows) for chat_id, rows in chats.items()))
+    await delete_outbox([message_id for ids in results for message_id in ids])
+    return len(batch)
+
+
+async def _run(bot):
+    while True:
+        _wakeup.clear()
+        try:
+            full = await drain(bot) == BATCH_SIZE
+        except Exception:
+            logger.exception("outbox dispatch failed")
+            full = False
+        if full:
+            continue
+        try:
+            await asyncio.wait_for(_wakeup.wait(), POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+_tasks = BackgroundTasks()
+
+
+def start(application):
+    _tasks.spawn(_run(application.bot))
+
+
+async def stop():
+    await _tasks.stop()
@@ -0,0 +1,103 @@
+# pagination.py
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from async_db import get_requests_page, search_requests
+from db import PAGE_SIZE, SEARCH_CANDIDATES
+
+PAGE_PATTERN = "^page:(prev|next|older):\\d+$"
+
+
+# `older` is set on ranked search pages when matches beyond the ranked
+# window exist (see db.search_requests).
+def _render(listing, rows, older=None, ranked=True):
+    msg = listing["title"] + ":\n\n"
+    msg += "ID | Task | Status | Comment (preview) | Msg?\n"
+    for r in rows:
+        msg += f"#{r.id} | {r.task_type} | {r.status} | {r.preview} | {'✅' if r.can_message else '🚫'}\n"
+    if older and ranked:
+        msg += f"\nℹ️ Ranked among the newest {SEARCH_CANDIDATES} matches; \"Older matches\" lists the rest.\n"
+    elif not ranked:
+        msg += "\nℹ️ Older matches, newest first (not ranked).\n"
+    msg += "\n" + listing["footer"]
+    return msg
+
+
+# Cursors are request ids, page offsets for ranked search results, or the
+# request id to continue below for older search matches.
+def _keyboard(listing, rows, has_prev, has_next, offset=0, older=None, ranked=True):
+    if "search" in listing and not ranked:
+        prev_cursor, next_cursor = 0, 0
+        labels = ("⬅️ Top matches", "")
+    elif "search" in listing:
+        prev_cursor, next_cursor = max(offset - PAGE_SIZE, 0), offset + PAGE_SIZE
+        labels = ("⬅️ Better matches", "More ➡️")
+    else:
+        prev_cursor, next_cursor = rows[0].id, rows[-1].id
+        labels = ("⬅️ Newer", "Older ➡️")
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton(labels[0], callback_data=f"page:prev:{prev_cursor}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(labels[1], callback_data=f"page:next:{next_cursor}"))
+    if older:
+        nav.append(InlineKeyboardButton("🕰 Older matches", callback_data=f"page:older:{older}"))
+    return InlineKeyboardMarkup([nav]) if nav else None
+
+
+async def _fetch(listing, before_id=None, after_id=None):
+    if "search" in listing:
+        return await search_requests(listing["search"])
+    rows, has_prev, has_next = await get_requests_page(
+        user_id=listing.get("user_id"),
+        statuses=listing.get("statuses"),
+        before_id=before_id,
+        after_id=after_id,
+    )
+    return rows, has_prev, has_next, None
+
+
+# --- First Page ---
+# `listing` holds the filter (user_id / statuses, or search text) plus title and footer text,
+# and is kept in user_data so the next/prev buttons can re-run the query.
+async def send_first_page(message, context: ContextTypes.DEFAULT_TYPE, listing):
+    context.user_data["listing"] = listing
+    rows, has_prev, has_next, older = await _fetch(listing)
+    if not rows:
+        return False
+    await message.reply_text(
+        _render(listing, rows, older), reply_markup=_keyboard(listing, rows, has_prev, has_next, older=older)
+    )
+    return True
+
+
+# --- Next / Prev Buttons ---
+async def handle_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    listing = context.user_data.get("listing")
+    if not listing:
+        return None
+
+    _, direction, cursor = query.data.split(":")
+    cursor = int(cursor)
+    offset = 0
+    ranked = direction != "older"
+    if "search" in listing and not ranked:
+        rows, has_prev, has_next, older = await search_requests(listing["search"], before_id=cursor)
+    elif "search" in listing:
+        offset = cursor
+        rows, has_prev, has_next, older = await search_requests(listing["search"], offset)
+    elif direction == "next":
+        rows, has_prev, has_next, older = await _fetch(listing, before_id=cursor)
+    else:
+        rows, has_prev, has_next, older = await _fetch(listing, after_id=cursor)
+
+    if not rows:
+        await query.message.reply_text("📭 No more requests.")
+        return None
+    await query.edit_message_text(
+        _render(listing, rows, older, ranked),
+        reply_markup=_keyboard(listing, rows, has_prev, has_next, offset, older, ranked)
+    )
+    return None
@@ -0,0 +1,141 @@
+# persistence.py
+
+import asyncio
+import json
+import pickle
+from telegram.ext import BasePersistence, PersistenceInput
+from async_db import load_persistence_data, load_conversations, save_persistence
+
+FLUSH_INTERVAL = 5  # seconds between PTB's persistence runs
+
+
+# --- SQLite Persistence ---
+# Keeps ConversationHandler states and user_data in tasks.db so deploys and
+# crashes don't drop in-flight requests.
+#
+# Write-behind: PTB already calls update_* only for chats/users touched since
+# the last run (every FLUSH_INTERVAL seconds). Those calls just stage rows in
+# memory; one background task then writes the whole batch in a single
+# transaction. Rows whose pickle is unchanged since the last write are
+# skipped, so merely reading user_data costs nothing. Only one write task
+# runs at a time (batches commit in order); it keeps writing until nothing
+# is staged and only then clears itself, so flush() can wait on it.
+class SQLitePersistence(BasePersistence):
+    def __init__(self, update_interval=FLUSH_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._data = {}           # (kind, id) -> pickled bytes, or None to drop
+        self._conversations = {}  # (name, key json) -> state json, or None to drop
+        self._written = {}        # (kind, id) / (name, key) -> hash of last stored value
+        self._flush_task = None
+
+    # --- Loading (once, at startup) ---
+    async def _load(self, kind):
+        result = {}
+        for id_, blob in await load_persistence_data(kind):
+            self._written[(kind, id_)] = hash(blob)
+            result[id_] = pickle.loads(blob)
+        return result
+
+    async def get_user_data(self):
+        return await self._load("user")
+
+    async def get_chat_data(self):
+        return await self._load("chat")
+
+    async def get_bot_data(self):
+        rows = await self._load("bot")
+        return rows.get(0, {})
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        result = {}
+        for key, state in await load_conversations(name):
+            self._written[(name, key)] = hash(state)
+            result[tuple(json.loads(key))] = json.loads(state)
+        return result
+
+    # --- Staging ---
+    def _stage_data(self, kind, id_, data):
+        blob = None if data is None else pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+        self._stage(self._data, (kind, id_), blob)
+
+    def _stage(self, pending, key, value):
+        last = self._written.get(key)
+        if (value is None and last is None and key not in pending) or (value is not None and hash(value) == last):
+            pending.pop(key, None)
+            return
+        pending[key] = value
+        if self._flush_task is None:
+            # Runs after PTB's current batch of update_* calls has been staged.
+            self._flush_task = asyncio.get_running_loop().create_task(self._write())
+
+    async def update_user_data(self, user_id, data):
+        self._stage_data("user", user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._stage_data("chat", chat_id, data)
+
+    async def update_bot_data(self, data):
+        self._stage_data("bot", 0, data)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        state = None if new_state is None else json.dumps(new_state)
+        self._stage(self._conversations, (name, json.dumps(list(key))), state)
+
+    async def drop_user_data(self, user_id):
+        self._stage_data("user", user_id, None)
+
+    async def drop_chat_data(self, chat_id):
+        self._stage_data("chat", chat_id, None)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    # --- Writing ---
+    async def _write(self):
+        try:
+            while self._data or self._conversations:
+                await self._write_batch()
+        finally:
+            self._flush_task = None
+
+    async def _write_batch(self):
+        data, self._data = self._data, {}
+        conversations, self._conversations = self._conversations, {}
+        try:
+            await save_persistence(
+                [(*key, blob) for key, blob in data.items() if blob is not None],
+                [key for key, blob in data.items() if blob is None],
+                [(*key, state) for key, state in conversations.items() if state is not None],
+                [key for key, state in conversations.items() if state is None],
+            )
+        except Exception:
+            # Put the batch back (newer staged values win) so the next run retries it.
+            self._data = {**data, **self._data}
+            self._conversations = {**conversations, **self._conversations}
+            raise
+        for key, value in (*data.items(), *conversations.items()):
+            if value is None:
+                self._written.pop(key, None)
+            else:
+                self._written[key] = hash(value)
+
+    async def flush(self):
+        while self._flush_task is not None or self._data or self._conversations:
+            if self._flush_task is None:
+                self._flush_task = asyncio.get_running_loop().create_task(self._write())
+            await self._flush_task
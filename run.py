@@ -3,20 +3,95 @@
 from telegram.ext import ApplicationBuilder
 from user import get_user_handler
 from admin import get_admin_handler, get_main_admin_handler
-from config import ADMIN_IDS,BOT_TOKEN  # optional: if needed inside main()
+from config import (
+    ADMIN_IDS, BOT_TOKEN, MODE, CONCURRENT_UPDATES, WORKERS,
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET,
+    METRICS_PORT, PROFILER_ENABLED, ARCHIVE_AFTER_DAYS
+)
+from db import init_db
+import async_db
+import broadcast
+from flood import get_flood_handler
+import outbox
+import archive
+import media
+import metrics
+from updates import PerUserUpdateProcessor
+from persistence import SQLitePersistence
 
 
+# Background jobs; in multi-process mode only worker 0 runs them.
+async def post_init(application):
+    metrics.start(METRICS_PORT, profiler_enabled=PROFILER_ENABLED)
+    await broadcast.resume_broadcasts(application)
+    outbox.start(application)
+    archive.start(ARCHIVE_AFTER_DAYS)
+
+
+async def post_stop(application):
+    await broadcast.stop()
+    await media.stop()
+    await archive.stop()
+    await outbox.stop()
+    await async_db.flush_writes()  # queued group-commit writes
+    metrics.stop()
+
+
+# base_url points the bot at another Bot API server (local load tests);
+# processor replaces the update processor (loadtest.py times every update).
+def build_app(token=BOT_TOKEN, base_url=None, processor=None):
+    builder = (
+        ApplicationBuilder()
+        .token(token)
+        .concurrent_updates(processor or PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .persistence(SQLitePersistence())
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .request(metrics.MetricsRequest(connection_pool_size=256))
+        .get_updates_request(metrics.MetricsRequest(connection_pool_size=1))
+    )
+    if base_url:
+        builder = builder.base_url(base_url).base_file_url(base_url.replace("/bot", "/file/bot"))
+    app = builder.build()
+
+    # Flood control runs first and can stop an update before any handler.
+    app.add_handler(get_flood_handler(), group=-1)
+
+    # Register conversation handlers (every callback is timed into metrics)
+    app.add_handler(metrics.instrument(get_user_handler()))
+    app.add_handler(metrics.instrument(get_admin_handler()))
+    app.add_handler(metrics.instrument(get_main_admin_handler()))
+    return app
+
 
 def main():
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    # Without a secret the webhook would accept any POST as an update.
+    if MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+        raise SystemExit("❌ Webhook mode needs WEBHOOK_URL and WEBHOOK_SECRET set in config.py")
+    # The cluster supervisor long-polls (and deletes any webhook).
+    if MODE == "webhook" and WORKERS > 1:
+        raise SystemExit("❌ WORKERS > 1 needs MODE = \"polling\"")
+
+    init_db()  # creates / upgrades the schema
 
-    # Register conversation handlers
-    app.add_handler(get_user_handler())
-    app.add_handler(get_admin_handler())
-    app.add_handler(get_main_admin_handler())
+    if WORKERS > 1:
+        from cluster import run_cluster
+        run_cluster(WORKERS)
+        return
 
-    print("✅ Bot is running...")
-    app.run_polling()
+    app = build_app()
+    if MODE == "webhook":
+        print(f"✅ Bot is running (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH})...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+        )
+    else:
+        print("✅ Bot is running...")
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,44 @@
+# updates.py
+
+import asyncio
+from telegram.ext import BaseUpdateProcessor
+
+
+# Runs updates from different users concurrently, but one at a time (in
+# arrival order) per user, so ConversationHandler state never races.
+# PTB's own semaphore would be taken before the per-user lock, letting one
+# user's queued updates fill every slot; so it gets an effectively unbounded
+# limit and the real one is taken inside the lock, by running updates only.
+UNBOUNDED = 1 << 30
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates):
+        super().__init__(UNBOUNDED)
+        self._running = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks = {}  # user id -> [asyncio.Lock, pending updates]
+
+    async def do_process_update(self, update, coroutine):
+        user = getattr(update, "effective_user", None)
+        if user is None:
+            async with self._running:
+                await coroutine
+            return
+
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._running:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user.id]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -1,33 +1,84 @@
 # user.py
 
 import os
-from uuid import uuid4
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     CallbackQueryHandler, CommandHandler, MessageHandler,
     ConversationHandler, ContextTypes, filters
 )
-from db import (
-    add_request, get_request_by_id, get_user_requests,
-    update_comment, update_status
+from async_db import (
+    add_request, get_request_by_id, get_request_status,
+    update_comment, update_status, upsert_subscriber
 )
+from config import LAZY_MEDIA
+from db import EDITABLE_STATUSES, get_task_catalog, UpdateConflict
+from notify import notify_admins
+from pagination import PAGE_PATTERN, handle_page, send_first_page
+import media
 
-SELECT_ACTION, SELECT_TYPE, COMMENT, MEDIA, CONFIRM, CHECK_ACTION, SELECT_BY_ID, FOLLOWUP = range(8)
-
-TASK_TYPES = ["Software Task", "Write Paper", "Make Presentation", "Other"]
-MEDIA_DIR = "media"
-os.makedirs(MEDIA_DIR, exist_ok=True)
+SELECT_ACTION, SELECT_TYPE, COMMENT, MEDIA, CONFIRM, CHECK_ACTION, SELECT_BY_ID, FOLLOWUP, EDIT_COMMENT = range(9)
 
 WELCOME_MSG = "👋 أهلا بك في ZU Assistix! كيف يمكنني مساعدتك؟"
 
+# --- Keyboards ---
+# Markups are immutable, so static menus are built once and the task-type
+# menu once per catalog version.
+MAIN_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ New Request", callback_data="new_request")],
+    [InlineKeyboardButton("📂 Check Request", callback_data="check_request")]
+])
+CHECK_MENU = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📜 Request History", callback_data="history")],
+    [InlineKeyboardButton("📌 Active Requests", callback_data="active")],
+    [InlineKeyboardButton("🔍 Check by ID", callback_data="by_id")],
+    [InlineKeyboardButton("🔙 Go Back", callback_data="back_main")]
+])
+SUBMIT_MENU = InlineKeyboardMarkup([[
+    InlineKeyboardButton("✅ Submit", callback_data="submit"),
+    InlineKeyboardButton("✏️ Edit", callback_data="edit"),
+    InlineKeyboardButton("❌ Cancel", callback_data="cancel")
+]])
+
+
+def _followup_menu(can_message):
+    buttons = [
+        [InlineKeyboardButton("✏️ Edit Comment", callback_data="edit_comment")],
+        [InlineKeyboardButton("❌ Cancel Request", callback_data="cancel_request")],
+    ]
+    if can_message:
+        buttons.append([InlineKeyboardButton("💬 Send Message to Admin", callback_data="send_message")])
+    buttons.append([InlineKeyboardButton("🔙 Go Back", callback_data="back_main")])
+    return InlineKeyboardMarkup(buttons)
+
+
+FOLLOWUP_MENUS = {False: _followup_menu(False), True: _followup_menu(True)}
+
+_type_menu = (None, None)  # (catalog version, markup)
+
+
+def task_type_menu():
+    global _type_menu
+    version, names = get_task_catalog()
+    if _type_menu[0] != version:
+        keyboard = [[InlineKeyboardButton(t, callback_data=t)] for t in names]
+        keyboard.append([InlineKeyboardButton("🔙 Go Back", callback_data="back_main")])
+        _type_menu = (version, InlineKeyboardMarkup(keyboard))
+    return _type_menu[1]
+
+
 # --- ENTRY ---
+# /start registers the user for announcements; every "back to menu" just
+# shows the menu.
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    await upsert_subscriber(user.id, user.username or user.first_name)
+    return await start(update, context)
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [InlineKeyboardButton("➕ New Request", callback_data="new_request")],
-        [InlineKeyboardButton("📂 Check Request", callback_data="check_request")]
-    ]
+    # Also called with a bare CallbackQuery from the "Go Back" buttons.
     message = update.message or update.callback_query.message
-    await message.reply_text(WELCOME_MSG, reply_markup=InlineKeyboardMarkup(keyboard))
+    await message.reply_text(WELCOME_MSG, reply_markup=MAIN_MENU)
 
     return SELECT_ACTION
 
@@ -39,19 +90,11 @@ async def select_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
     choice = query.data
 
     if choice == "new_request":
-        keyboard = [[InlineKeyboardButton(t, callback_data=t)] for t in TASK_TYPES]
-        keyboard.append([InlineKeyboardButton("🔙 Go Back", callback_data="back_main")])
-        await query.message.reply_text("📝 Choose request type:", reply_markup=InlineKeyboardMarkup(keyboard))
+        await query.message.reply_text("📝 Choose request type:", reply_markup=task_type_menu())
         return SELECT_TYPE
 
     elif choice == "check_request":
-        keyboard = [
-            [InlineKeyboardButton("📜 Request History", callback_data="history")],
-            [InlineKeyboardButton("📌 Active Requests", callback_data="active")],
-            [InlineKeyboardButton("🔍 Check by ID", callback_data="by_id")],
-            [InlineKeyboardButton("🔙 Go Back", callback_data="back_main")]
-        ]
-        await query.message.reply_text("📂 Choose option:", reply_markup=InlineKeyboardMarkup(keyboard))
+        await query.message.reply_text("📂 Choose option:", reply_markup=CHECK_MENU)
         return CHECK_ACTION
 
 
@@ -63,6 +106,11 @@ async def select_task_type(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query.data == "back_main":
         return await start(query, context)
 
+    # The menu may predate an admin's change to the task types.
+    if query.data not in get_task_catalog()[1]:
+        await query.message.reply_text("⚠️ That type is no longer offered. Choose again:", reply_markup=task_type_menu())
+        return SELECT_TYPE
+
     context.user_data["task_type"] = query.data
     await query.message.reply_text("✍️ Please write your comment:")
     return COMMENT
@@ -82,39 +130,41 @@ async def receive_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if update.message.photo:
         file = update.message.photo[-1]
-        file_ext = ".jpg"
+        file_ext, kind = ".jpg", "photo"
     elif update.message.document:
         file = update.message.document
-        file_ext = os.path.splitext(file.file_name)[-1]
+        file_ext, kind = os.path.splitext(file.file_name or "")[-1] or ".bin", "document"
     elif update.message.voice:
         file = update.message.voice
-        file_ext = ".ogg"
+        file_ext, kind = ".ogg", "voice"
 
     if not file:
         await update.message.reply_text("❗ Unsupported file. Try again or type 'skip'.")
         return MEDIA
 
-    tg_file = await file.get_file()
-    file_name = f"{uuid4()}{file_ext}"
-    await tg_file.download_to_drive(os.path.join(MEDIA_DIR, file_name))
-    context.user_data["media"] = file_name
+    # The cap is what the bot can download; lazy mode never downloads.
+    if not LAZY_MEDIA and file.file_size and file.file_size > media.MAX_MEDIA_BYTES:
+        await update.message.reply_text(
+            f"❗ File is too large (max {media.MAX_MEDIA_BYTES // (1024 * 1024)} MB). Try again or type 'skip'."
+        )
+        return MEDIA
+
+    # The download runs in the background; the blob is linked to the request once it lands.
+    media.discard(context.user_data.pop("media_job", None))
+    context.user_data["media_file"] = (file.file_id, kind)
+    if not LAZY_MEDIA:
+        context.user_data["media_job"] = media.submit(file, file_ext)
 
     return await show_submit_options(update, context)
 
 async def skip_media(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["media"] = None
+    media.discard(context.user_data.pop("media_job", None))
+    context.user_data.pop("media_file", None)
     return await show_submit_options(update, context)
 
 # --- SHOW CONFIRM ---
 async def show_submit_options(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    buttons = [
-        [
-            InlineKeyboardButton("✅ Submit", callback_data="submit"),
-            InlineKeyboardButton("✏️ Edit", callback_data="edit"),
-            InlineKeyboardButton("❌ Cancel", callback_data="cancel")
-        ]
-    ]
-    await update.message.reply_text("📤 What do you want to do?", reply_markup=InlineKeyboardMarkup(buttons))
+    await update.message.reply_text("📤 What do you want to do?", reply_markup=SUBMIT_MENU)
     return CONFIRM
 
 
@@ -126,13 +176,19 @@ async def handle_submission(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = query.from_user
     task_type = context.user_data.get("task_type")
     comment = context.user_data.get("comment")
-    media = context.user_data.get("media")
+    media_job = context.user_data.pop("media_job", None)
+    file_id, kind = context.user_data.pop("media_file", None) or (None, None)
 
-    req_id = add_request(user.id, user.username or user.first_name, task_type, None, comment, media)
+    req_id = await add_request(
+        user.id, user.username or user.first_name, task_type, None, comment,
+        media_file_id=file_id, media_kind=kind
+    )
+    if media_job:
+        await media.attach(media_job, req_id)
     await query.message.reply_text(
         f"✅ Submitted! Your request ID is #{req_id}.\n\n"
         f"📝 Type: {task_type}\n"
-        f"📎 Media: {'Attached' if media else 'None'}"
+        f"📎 Media: {'Attached' if file_id else 'None'}"
     )
     return await start(update, context)
 
@@ -142,6 +198,8 @@ async def edit_comment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return COMMENT
 
 async def cancel_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    media.discard(context.user_data.pop("media_job", None))
+    context.user_data.pop("media_file", None)
     await update.callback_query.answer()
     await update.callback_query.message.reply_text("❌ Request canceled.")
     return await start(update, context)
@@ -156,27 +214,19 @@ async def check_options(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if choice == "back_main":
         return await start(query, context)
-    user_id = query.from_user.id
+    listing = {
+        "user_id": query.from_user.id,
+        "statuses": None,
+        "title": "📜 Request History",
+        "footer": "🔍 To view/edit/cancel, send the request ID (e.g., 3)",
+    }
+    if choice == "active":
+        listing["statuses"] = ("waiting", "accepted")
+        listing["title"] = "🕒 Active Requests"
 
-    rows = get_user_requests(user_id)
-    if not rows:
+    if not await send_first_page(query.message, context, listing):
         await query.message.reply_text("📭 No requests found.")
         return CHECK_ACTION
-
-    if choice == "active":
-        rows = [r for r in rows if r[7] == "waiting" or r[7] == "accepted"]
-        title = "🕒 Active Requests"
-    else:
-        title = "📜 Request History"
-
-    msg = title + ":\n\n"
-    msg += "ID | Task | Status | Comment (preview) | Msg?\n"
-    for r in rows:
-        preview = (r[5][:20] + '...') if len(r[5]) > 20 else r[5]
-        msg += f"#{r[0]} | {r[3]} | {r[7]} | {preview} | {'✅' if r[8] else '🚫'}\n"
-
-    msg += "\n🔍 To view/edit/cancel, send the request ID (e.g., 3)"
-    await query.message.reply_text(msg)
     return SELECT_BY_ID
 
 
@@ -188,38 +238,31 @@ async def handle_request_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return SELECT_BY_ID
 
     req_id = int(text)
-    row = get_request_by_id(req_id)
-    if not row or row[1] != update.effective_user.id:
+    row = await get_request_by_id(req_id)
+    if not row or row.user_id != update.effective_user.id:
         await update.message.reply_text("❌ Request not found or not yours.")
         return SELECT_BY_ID
 
     # 🚫 Block cancelled requests
-    if row[7] == "cancelled":
+    if row.status == "cancelled":
         await update.message.reply_text("🚫 You cannot view or edit cancelled requests.")
         return await start(update, context)
 
+    # Only the id and the version shown are kept; rows are re-read when
+    # needed, and edits fail if an admin changed the request since.
     context.user_data["selected_id"] = req_id
-    context.user_data["selected_request"] = row
-    context.user_data["can_message"] = row[8]
+    context.user_data["selected_version"] = row.version
 
     msg = (
-        f"📄 Request #{row[0]}\n"
-        f"📝 Type: {row[3]}\n"
-        f"📌 Status: {row[7]}\n"
-        f"💬 Comment: {row[5]}\n"
-        f"📎 Media: {'Attached' if row[6] else 'None'}\n"
-        f"📨 Can message admin: {'✅' if row[8] else '🚫'}"
+        f"📄 Request #{row.id}\n"
+        f"📝 Type: {row.task_type}\n"
+        f"📌 Status: {row.status}\n"
+        f"💬 Comment: {row.comment}\n"
+        f"📎 Media: {'Attached' if row.media or row.media_file_id else 'None'}\n"
+        f"📨 Can message admin: {'✅' if row.can_message else '🚫'}"
     )
 
-    buttons = [
-        [InlineKeyboardButton("✏️ Edit Comment", callback_data="edit_comment")],
-        [InlineKeyboardButton("❌ Cancel Request", callback_data="cancel_request")],
-    ]
-    if row[8]:
-        buttons.append([InlineKeyboardButton("💬 Send Message to Admin", callback_data="send_message")])
-    buttons.append([InlineKeyboardButton("🔙 Go Back", callback_data="back_main")])
-
-    await update.message.reply_text(msg, reply_markup=InlineKeyboardMarkup(buttons))
+    await update.message.reply_text(msg, reply_markup=FOLLOWUP_MENUS[bool(row.can_message)])
     return FOLLOWUP
 
 
@@ -229,45 +272,64 @@ async def handle_followup_buttons(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
     action = query.data
-    req = context.user_data.get("selected_request")
+    req_id = context.user_data.get("selected_id")
+    status = req_id and await get_request_status(req_id, query.from_user.id)
 
-    if not req:
+    if not status:
         await query.message.reply_text("⚠️ No request selected.")
         return SELECT_ACTION
 
-    status = req[7]  # status is at index 7 in the DB row
-
     if status == "cancelled" and action in ["edit_comment", "send_message"]:
         await query.message.reply_text("🚫 This request is cancelled and cannot be modified.")
         return SELECT_ACTION
 
     if action == "edit_comment":
+        if status not in EDITABLE_STATUSES:
+            await query.message.reply_text(f"🔒 This request is {status} and can no longer be edited.")
+            return FOLLOWUP
         await query.message.reply_text("✏️ Send your updated comment:")
-        return COMMENT
+        return EDIT_COMMENT
 
     elif action == "send_message":
         await query.message.reply_text("💬 Type your message to send to the admin:")
         return FOLLOWUP
 
     elif action == "cancel_request":
-        update_status(req[0], "cancelled")
+        try:
+            await update_status(req_id, "cancelled", expected_version=context.user_data.get("selected_version"))
+        except UpdateConflict as e:
+            await query.message.reply_text(_conflict_text(e))
+            return await start(update, context)
         await query.message.reply_text("❌ Request has been cancelled.")
         return await start(update, context)
 
     return SELECT_ACTION
 
 
+def _conflict_text(conflict):
+    if conflict.reason in ("locked", "transition"):
+        return f"🔒 This request is {conflict.status} and can no longer be changed."
+    return "⚠️ An admin updated this request in the meantime. Please open it again."
+
+
+# The update only applies if the request is still waiting and unchanged
+# since it was shown, so it can't overwrite what an admin already accepted.
+async def receive_edited_comment(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    req_id = context.user_data.get("selected_id")
+    try:
+        await update_comment(req_id, update.message.text, expected_version=context.user_data.get("selected_version"))
+    except UpdateConflict as e:
+        await update.message.reply_text(_conflict_text(e))
+        return await start(update, context)
+    await update.message.reply_text("✅ Comment updated.")
+    return await start(update, context)
+
+
 async def handle_user_message_to_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     req_id = context.user_data.get("selected_id")
     user = update.effective_user
-    msg = update.message.text
 
-    from run import ADMIN_IDS  # dynamically import to avoid circular import
-    for admin_id in ADMIN_IDS:
-        await update.get_bot().send_message(
-            admin_id,
-            f"📨 Message from @{user.username or user.first_name} (Request #{req_id}):\n{msg}"
-        )
+    notify_admins(context.application, req_id, user.id, user.username or user.first_name, update.message.text)
     await update.message.reply_text("✅ Message sent to admin.")
     return FOLLOWUP
 
@@ -275,7 +337,7 @@ async def handle_user_message_to_admin(update: Update, context: ContextTypes.DEF
 # --- ConversationHandler ---
 def get_user_handler():
     return ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+        entry_points=[CommandHandler("start", start_command)],
         states={
             SELECT_ACTION: [CallbackQueryHandler(select_action)],
             SELECT_TYPE: [CallbackQueryHandler(select_task_type)],
@@ -290,12 +352,18 @@ def get_user_handler():
                 CallbackQueryHandler(cancel_request, pattern="^cancel$")
             ],
             CHECK_ACTION: [CallbackQueryHandler(check_options)],
-            SELECT_BY_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_request_id)],
+            SELECT_BY_ID: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_request_id),
+                CallbackQueryHandler(handle_page, pattern=PAGE_PATTERN)
+            ],
             FOLLOWUP: [
                 CallbackQueryHandler(handle_followup_buttons),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_user_message_to_admin)
-            ]
+            ],
+            EDIT_COMMENT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_edited_comment)]
         },
         fallbacks=[],
-        allow_reentry=True
+        allow_reentry=True,
+        name="user",
+        persistent=True
     )